@@ -5,6 +5,8 @@ Created on Mon Nov  9 09:36:07 2020
 @author: 123
 """
 
+import collections
+
 class Point:
     """Encodes a live point in the Game of Life"""
     def __init__(self, x, y):
@@ -34,20 +36,41 @@ class Point:
                     s.add(Point(self.x+i, self.y+j))
         return s
         
+def parse_rule(rule):
+    """Return the sets (birth, survival) of the numbers of live neighbors
+    for which a dead point comes alive, resp. a live point stays alive,
+    from a rulestring such as 'B3/S23' (or '23/3', survival first).
+    """
+    parts = rule.strip().upper().replace(' ', '').split('/')
+    if len(parts) == 2:
+        if parts[0][:1] == 'B' and parts[1][:1] == 'S':
+            birth, survival = parts[0][1:], parts[1][1:]
+        elif parts[0][:1] == 'S' and parts[1][:1] == 'B':
+            survival, birth = parts[0][1:], parts[1][1:]
+        else:
+            survival, birth = parts
+        if all(c in '012345678' for c in birth + survival) and '0' not in birth:
+            return set(map(int, birth)), set(map(int, survival))
+    raise ValueError('invalid rule: {}'.format(rule))
+
 class Board:
     """Store the current board and manipulate it.
     """
-    def __init__(self, sizex, sizey, points):
-        """Initialize size and initial points."""
+    def __init__(self, sizex, sizey, points, rule='B3/S23'):
+        """Initialize size, initial points and the rule (see parse_rule).
+        A size of None leaves the board unbounded along that coordinate.
+        """
         self.points = points
         self.sizex = sizex
         self.sizey = sizey
         self.x_size = sizex
         self.y_size = sizey
+        self.birth, self.survival = parse_rule(rule)
                         
     def is_legal(self, point):
         """Check if a given Point is on the board."""
-        return self.sizex>point.x>=0 and self.sizey>point.y>=0
+        return ((self.sizex is None or self.sizex>point.x>=0) and
+                (self.sizey is None or self.sizey>point.y>=0))
     
     def number_live_neighbors(self, p):
         """Compute the number of neighbors of p on the Board that are alive.
@@ -57,14 +80,22 @@ class Board:
     def next_step(self):
         """Compute the points alive in the next round and update the 
         points of the Board.
+        Each live point adds one to the count of each of its neighbors,
+        so that a round takes time proportional to the number of live
+        points, whatever the size of the board.
         """
+        alive = {(p.x, p.y) for p in self.points}
+        counts = collections.Counter((x+i, y+j) for (x, y) in alive
+                                     for i in (-1, 0, 1) for j in (-1, 0, 1)
+                                     if (i, j) != (0, 0))
+        if 0 in self.survival:
+            for xy in alive: counts[xy] += 0
         points_alive = set()
-        for point in self.points:
-            if self.number_live_neighbors(point) in {2, 3}: points_alive.add(point)
-        for p in self.points:
-            for i in p.get_neighbors():
-                if i in self.points or self.is_legal(i) == False: continue
-                if self.number_live_neighbors(i) == 3: points_alive.add(i)
+        for (x, y), n in counts.items():
+            if (x, y) in alive:
+                if n in self.survival: points_alive.add(Point(x, y))
+            elif n in self.birth and self.is_legal(Point(x, y)):
+                points_alive.add(Point(x, y))
         self.points = points_alive
         
     def load_from_file(self, filename):
@@ -74,11 +105,12 @@ class Board:
         - Each of the following lines gives the coordinates of a single point,
             with the two coordinate values separated by a comma.
             Those are the points that are alive in the board to be loaded.
+        A size of None (unbounded board) is written as None.
         """
         self.points = set()
         with open(filename) as f:
-            self.x_size = int(f.readline())
-            self.y_size = int(f.readline())
+            self.sizex = parse_size(f.readline())
+            self.sizey = parse_size(f.readline())
             for line in f.readlines():
                 (one,two) = line.strip().split(',')
                 self.points.add(Point(int(one.strip()), int(two.strip())))
@@ -101,8 +133,18 @@ class Board:
             for p in self.points:
                 f.write('{},{}\n'.format(p.x, p.y))
 
+def parse_size(line):
+    """Return the size written on line by save_to_file (None or an int)."""
+    line = line.strip()
+    return None if line == 'None' else int(line)
+
 def is_periodic(board):
-    """Return True if the input board is periodic, otherwise False."""
+    """Return True if the input board is periodic, otherwise False.
+    Only bounded boards are supported: a glider on an unbounded board
+    never comes back.
+    """
+    if board.sizex is None or board.sizey is None:
+        raise ValueError('is_periodic needs a bounded board')
     initial_points = board.points.copy()
     for i in range(2**board.sizex):
         board.next_step()
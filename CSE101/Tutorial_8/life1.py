@@ -1,5 +1,7 @@
 """TD 8: Conway's game of life."""
 
+import sys
+
 class Point:
     """Encodes a live point in the Game of Life.
 
@@ -122,28 +124,51 @@ class TextView():
 
     Data attributes:
     board -- the Board object to be displayed
+    diff -- if True, after the first frame only the rows that changed
+        are written again, moving the cursor with ANSI escape codes
+        (for terminals)
     """
 
-    def __init__(self, board):
+    def __init__(self, board, diff=False):
         """Initialize the Board."""
         self.board = board
+        self.diff = diff
+        self.rows = None
+
+    def render(self):
+        """Return the rows of the frame of the Board as strings, built
+        from the live points rather than by testing every cell.
+        """
+        sizex, sizey = self.board.sizex, self.board.sizey
+        cells = [[' '] * sizex for _ in range(sizey)]
+        for p in self.board.points:
+            if 0 <= p.x < sizex and 0 <= p.y < sizey:
+                cells[p.y][p.x] = 'X'
+        border = 'o' * (sizex + 2)
+        return [border] + ['o' + ''.join(row) + 'o' for row in cells] + [border]
 
     def show(self):
-        """Show the Board."""
-        print('o' * (self.board.sizex+2))
-        for y in range(self.board.sizey):
-            print('o', end='')
-            for x in range(self.board.sizex):
-                if Point(x, y) in self.board.points:
-                    print('X', end='')
-                else:
-                    print(' ', end='')
-            print('o')
-        print('o' * (self.board.sizex + 2))
+        """Show the Board, writing the frame at once."""
+        rows = self.render()
+        if not self.diff or self.rows is None or len(rows) != len(self.rows):
+            sys.stdout.write(''.join(row + '\n' for row in rows))
+        else:
+            # The cursor is on the line below the frame: go up to each
+            # changed row, rewrite it, and come back down.
+            out = []
+            for i, (old, new) in enumerate(zip(self.rows, rows)):
+                if old != new:
+                    up = len(rows) - i
+                    out.append('\x1b[{}F{}\x1b[{}E'.format(up, new, up))
+            sys.stdout.write(''.join(out))
+        sys.stdout.flush()
+        self.rows = rows
 
     def tick(self):
         input('Press Enter for next step')
-
+        if self.diff:
+            # Erase the prompt, so that the frame stays just above
+            sys.stdout.write('\x1b[1F\x1b[2K')
 
 class LifeGame:
     """The game loop for the text based Game of Life.
@@ -158,11 +183,16 @@ class LifeGame:
         self.board = board
         self.view = TextView(board)
 
-    def run(self, steps):
+    def run(self, steps, headless=False):
         """Run the game of life for the given number of steps. At every step,
         show the board and prompt the user to continue by calling tick() on the
-        TextView.
+        TextView. If headless is True, only step the board, without showing
+        it or waiting for the user.
         """
+        if headless:
+            for _ in range(steps):
+                self.board.next_step()
+            return
         for _ in range(steps):
             self.view.show()
             self.view.tick()
@@ -3,6 +3,7 @@ import collections
 import io
 from contextlib import redirect_stdout
 import life
+import life1
 
 def generic_tester(f,tests):
     """Generic testing procedure.
@@ -255,6 +256,29 @@ oooooooooooooooooooooooooooooooooooooooooo
                for (args,res) in raw_tests ]
     generic_tester(ordered_print_tester, tests)    
     
+def textView1_show(diff):
+    b = life1.Board(5,5,{life1.Point(1,2), life1.Point(2,2), life1.Point(3,2)})
+    t = life1.TextView(b, diff)
+    t.show()
+    b.next_step()
+    t.show()
+
+def headless_run():
+    b = life1.Board(5,5,{life1.Point(1,2), life1.Point(2,2), life1.Point(3,2)})
+    life1.LifeGame(b).run(3, headless=True)
+    return b.points
+
+def test_show_life1():
+    tests = [((textView1_show,(False,)),
+              'ooooooo\no     o\no     o\no XXX o\no     o\no     o\nooooooo\n'
+              'ooooooo\no     o\no  X  o\no  X  o\no  X  o\no     o\nooooooo\n'),
+             ((textView1_show,(True,)),
+              'ooooooo\no     o\no     o\no XXX o\no     o\no     o\nooooooo\n'
+              '\x1b[5Fo  X  o\x1b[5E\x1b[4Fo  X  o\x1b[4E\x1b[3Fo  X  o\x1b[3E')]
+    generic_tester(ordered_print_tester, tests)
+    generic_value_tester([headless_run],
+                         [{life1.Point(2,1), life1.Point(2,2), life1.Point(2,3)}])
+    
 def neighbors1():
     return life.Point(5,5).get_neighbors()
 
@@ -355,7 +379,55 @@ def test_next_step():
     values = [{life.Point(2,1),life.Point(2,2),life.Point(2,3)},
               {life.Point (2, 1), life.Point (2, 0)}]
     generic_value_tester(functions, values)
-    
+
+def next_step_seeds():
+    b = life.Board(5,5,{life.Point(2,1),life.Point(2,3)}, 'B2/S')
+    b.next_step()
+    return b.points
+
+def next_step_highlife():
+    b = life.Board(5,5,{life.Point(1,2),life.Point(2,2),life.Point(3,2)}, 'B36/S23')
+    b.next_step()
+    return b.points
+
+def test_next_step_rule():
+    functions = [next_step_seeds, next_step_highlife]
+    values = [{life.Point(1,2),life.Point(2,2),life.Point(3,2)},
+              {life.Point(2,1),life.Point(2,2),life.Point(2,3)}]
+    generic_value_tester(functions, values)
+
+def next_step_unbounded():
+    b = life.Board(None,None,{life.Point(1,2),life.Point(2,3),life.Point(3,1),
+                              life.Point(3,2),life.Point(3,3)})
+    for i in range(40):
+        b.next_step()
+    return b.points
+
+def next_step_edge():
+    b = life.Board(5,None,{life.Point(1,0),life.Point(2,0),life.Point(3,0)})
+    b.next_step()
+    return b.points
+
+def next_step_isolated():
+    b = life.Board(5,5,{life.Point(0,0),life.Point(4,4)}, 'B3/S0')
+    b.next_step()
+    return b.points
+
+def test_next_step_sparse():
+    functions = [next_step_unbounded, next_step_edge, next_step_isolated]
+    values = [{life.Point(11,12),life.Point(12,13),life.Point(13,11),
+               life.Point(13,12),life.Point(13,13)},
+              {life.Point(2,-1),life.Point(2,0),life.Point(2,1)},
+              {life.Point(0,0),life.Point(4,4)}]
+    generic_value_tester(functions, values)
+
+def test_parse_rule():
+    tests = [(('B3/S23',), ({3}, {2, 3})),
+             (('23/3',), ({3}, {2, 3})),
+             (('b36/s23',), ({3, 6}, {2, 3})),
+             (('S/B2',), ({2}, set()))]
+    generic_tester(life.parse_rule, tests)
+
 def load_blinker_size():
     b1 = life.Board(1,1,set())
     b1.load_from_file('blinker.lf')
@@ -413,3 +485,17 @@ def test_save():
     values = [True]
     generic_value_tester(functions, values)
 
+
+def test_unbounded(tmp_path):
+    b1 = life.Board(None,5,{life.Point(-3,2), life.Point(1,2)})
+    try:
+        life.is_periodic(b1)
+        assert False
+    except ValueError:
+        pass
+
+    path = str(tmp_path / 'unbounded.lf')
+    b1.save_to_file(path)
+    b2 = life.Board(6,6,set())
+    b2.load_from_file(path)
+    assert b2.points == b1.points and b2.sizex is None and b2.sizey == 5
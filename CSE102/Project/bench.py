@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Title: Benchmarks of the Life engines
+
+Runs each engine on each pattern for a number of generations, and
+reports per run:
+
+ - `gens_per_s`, generations per second (best of `repeat` runs),
+ - `peak_bytes`, the peak of the memory allocated while running
+   (measured by `tracemalloc` in a separate run, as tracing slows the
+   engines down),
+ - `population`, the final number of live cells, so that the engines
+   can be checked against each other,
+ - `nodes` and `hc_size` for HashLife: the canonical nodes created by
+   the run, and the size of the hash-consing table after it.
+
+The patterns are the `.lf` boards of CSE101/Tutorial_8 (size, then one
+`x,y` live point per line), random soups and a Gosper glider gun. The
+bounded engines run on the board of the pattern (dead outside), while
+HashLife runs on the unbounded plane: their populations differ once
+the pattern reaches the edges.
+
+    python bench.py -n 100 --json results.json
+
+The JSON output is a list of records sorted by pattern and engine,
+written with sorted keys so that results of two commits can be diffed.
+"""
+
+import argparse
+import glob
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import hashlife
+from hashlife import BitRowUniverse, HashLifeUniverse, NaiveUniverse, NumpyUniverse
+from patterns import InvalidPattern, read_lf, read_rle, soup
+
+TUTORIAL = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, os.pardir, 'CSE101', 'Tutorial_8')
+
+GOSPER = '''x = 36, y = 9, rule = B3/S23
+24bo$22bobo$12b2o6b2o12b2o$11bo3bo4b2o12b2o$2o8bo5bo3b2o$2o8bo3bob2o4b
+obo$10bo5bo7bo$11bo3bo$12b2o!
+'''
+
+# --------------------------------------------------------------------
+# Patterns, as (width, height, live cells)
+
+def gun(margin = 32):
+    """Gosper glider gun, on a board with `margin` cells around it"""
+    universe = read_rle(io.StringIO(GOSPER))
+    imin, jmin, imax, jmax = universe.live_bbox()
+    cells = {(i - imin + margin, j - jmin + margin)
+             for i in range(imin, imax) for j in range(jmin, jmax) if universe.get(i, j)}
+    return imax - imin + 2 * margin, jmax - jmin + 2 * margin, cells
+
+def default_patterns():
+    patterns = {}
+    for path in sorted(glob.glob(os.path.join(TUTORIAL, '*.lf'))):
+        try:
+            with open(path) as stream:
+                pattern = read_lf(stream)
+        except InvalidPattern:
+            # e.g. the empty test.lf
+            continue
+        patterns[os.path.splitext(os.path.basename(path))[0]] = pattern
+    for size in (32, 64):
+        patterns['soup{}'.format(size)] = soup(size)
+    patterns['gosper'] = gun()
+    return patterns
+
+# --------------------------------------------------------------------
+# Engines: each one builds a universe from a pattern, and returns it
+# with a function giving its population.
+
+def _grid(width, height, cells):
+    grid = [[False] * height for _ in range(width)]
+    for x, y in cells:
+        grid[x][y] = True
+    return grid
+
+def _dense(cls):
+    def make(width, height, cells):
+        universe = cls(width, height, _grid(width, height, cells))
+        return universe, lambda: int(sum(map(sum, universe.cells)))
+    return make
+
+def _bitrow(width, height, cells):
+    universe = BitRowUniverse.from_points(width, height, cells)
+    return universe, lambda: len(universe.points())
+
+def _board(width, height, cells):
+    if TUTORIAL not in sys.path:
+        sys.path.append(TUTORIAL)
+    import life
+
+    board = life.Board(width, height, {life.Point(x, y) for x, y in cells})
+    board.rounds = lambda n: [board.next_step() for _ in range(n)]
+    return board, lambda: len(board.points)
+
+def _hashlife(width, height, cells):
+    # A private memo, so that each run starts cold
+    universe = HashLifeUniverse.from_cells(cells, budget = hashlife.Memo.DEFAULT_LIMIT)
+    return universe, lambda: universe.root.population
+
+ENGINES = {
+    'naive'   : _dense(NaiveUniverse),
+    'numpy'   : _dense(NumpyUniverse),
+    'bitrow'  : _bitrow,
+    'board'   : _board,
+    'hashlife': _hashlife,
+}
+
+# --------------------------------------------------------------------
+def run(engine, pattern, generations, repeat = 1, memory = True):
+    """Record of `engine` running `pattern` for `generations` rounds"""
+    make = ENGINES[engine]
+
+    best = None
+    for _ in range(repeat):
+        universe, population = make(*pattern)
+        start = time.perf_counter()
+        universe.rounds(generations)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+
+    record = dict(
+        engine      = engine,
+        generations = generations,
+        seconds     = best,
+        gens_per_s  = generations / best if best else None,
+        population  = population(),
+        peak_bytes  = None,
+        nodes       = None,
+        hc_size     = None,
+    )
+
+    if memory:
+        universe, population = make(*pattern)
+        with hashlife.profiling() as profile:
+            tracemalloc.start()
+            try:
+                universe.rounds(generations)
+                record['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        if engine == 'hashlife':
+            record['nodes']   = sum(profile.nodes.values())
+            record['hc_size'] = len(hashlife.HC)
+
+    return record
+
+def bench(patterns, engines = tuple(ENGINES), generations = 100, repeat = 1, memory = True):
+    """Records of all the `engines` running all the `patterns`"""
+    records = []
+    for name in sorted(patterns):
+        for engine in sorted(engines):
+            record = run(engine, patterns[name], generations, repeat, memory)
+            record['pattern'] = name
+            records.append(record)
+    return records
+
+def report(records, stream = sys.stdout):
+    """Write `records` to `stream` as a table"""
+    stream.write('{:<12} {:<9} {:>12} {:>11} {:>12} {:>9}\n'.format(
+        'pattern', 'engine', 'gens/s', 'population', 'peak bytes', 'nodes'))
+    for r in records:
+        stream.write('{:<12} {:<9} {:>12.1f} {:>11} {:>12} {:>9}\n'.format(
+            r['pattern'], r['engine'], r['gens_per_s'] or float('inf'), r['population'],
+            '-' if r['peak_bytes'] is None else r['peak_bytes'],
+            '-' if r['nodes'] is None else r['nodes']))
+
+# --------------------------------------------------------------------
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Benchmark the Life engines')
+    parser.add_argument('-n', '--generations', type = int, default = 100)
+    parser.add_argument('-r', '--repeat', type = int, default = 1,
+                        help = 'runs to time, keeping the best')
+    parser.add_argument('-e', '--engine', action = 'append', choices = sorted(ENGINES),
+                        help = 'engine to run (default: all), may be repeated')
+    parser.add_argument('-p', '--pattern', action = 'append',
+                        help = 'pattern to run (default: all), may be repeated')
+    parser.add_argument('--no-memory', action = 'store_true',
+                        help = 'skip the traced run measuring the memory')
+    parser.add_argument('--json', metavar = 'PATH',
+                        help = 'write the records as JSON to PATH (- for stdout)')
+    args = parser.parse_args(argv)
+
+    patterns = default_patterns()
+    if args.pattern:
+        unknown = set(args.pattern) - set(patterns)
+        if unknown:
+            parser.error('unknown patterns: {}'.format(', '.join(sorted(unknown))))
+        patterns = { name: patterns[name] for name in args.pattern }
+
+    records = bench(patterns, args.engine or tuple(ENGINES),
+                    args.generations, args.repeat, not args.no_memory)
+
+    if args.json == '-':
+        json.dump(records, sys.stdout, indent = 1, sort_keys = True)
+        sys.stdout.write('\n')
+        return
+    report(records)
+    if args.json:
+        with open(args.json, 'w') as stream:
+            json.dump(records, stream, indent = 1, sort_keys = True)
+            stream.write('\n')
+
+if __name__ == '__main__':
+    main()
@@ -13,15 +13,283 @@ GROUP = [
 ]
 
 
+import collections
+import contextlib
 import copy
+import json
 import math
 import numpy as np
+import time
 import weakref
 
+# The table is keyed by the identities of the quadrants rather than by
+# the node itself: a `WeakValueDictionary` holds its keys strongly, so
+# using the node as key would keep every canonical node alive forever.
+# The quadrants cannot be reused while the entry exists since the
+# canonical node (the value) holds them.
+
 HC = weakref.WeakValueDictionary()
 
+# Canonical empty nodes, by level (see `AbstractNode.zero`)
+ZERO = []
+
 def hash_consing(s):
-    return HC.setdefault(s, s)
+    node = HC.setdefault(s.key(), s)
+    if PROFILE is not None and node is s:
+        PROFILE.nodes[s.level] += 1
+    return node
+
+# --------------------------------------------------------------------
+# Profiling
+#
+# Within `with profiling() as profile:`, the memo of `forward` counts
+# its hits and misses per level, `hash_consing` counts the canonical
+# nodes it creates per level, and `HashLifeUniverse.rounds` times each
+# of its steps. Otherwise, `PROFILE` is `None` and each of these only
+# costs a test.
+
+PROFILE = None
+
+class Profile:
+    def __init__(self):
+        self.hits   = collections.Counter()
+        self.misses = collections.Counter()
+        self.nodes  = collections.Counter()
+        self.steps  = []
+
+    def step(self, generation, l, level, seconds, nodes, memo):
+        """Record a step of 2^l rounds from `generation`"""
+        self.steps.append(dict(
+            generation = generation,
+            rounds     = 1 << l   ,
+            level      = level    ,
+            seconds    = seconds  ,
+            new_nodes  = nodes    ,
+            hc_size    = len(HC)  ,
+            memo_size  = memo     ,
+        ))
+
+    def as_dict(self):
+        levels = sorted(set(self.hits) | set(self.misses) | set(self.nodes))
+        return dict(
+            levels = { level: dict(
+                hits      = self.hits  [level],
+                misses    = self.misses[level],
+                hit_rate  = self.hits[level] / max(1, self.hits[level] + self.misses[level]),
+                new_nodes = self.nodes [level],
+            ) for level in levels },
+            steps   = self.steps,
+            hc_size = len(HC)   ,
+        )
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.as_dict(), **kwargs)
+
+@contextlib.contextmanager
+def profiling():
+    global PROFILE
+
+    previous, PROFILE = PROFILE, Profile()
+    try:
+        yield PROFILE
+    finally:
+        PROFILE = previous
+
+# --------------------------------------------------------------------
+# Rules
+#
+# An outer-totalistic rule gives the next state of a cell from its
+# state and its number of live neighbours: a dead cell is born, and a
+# live one survives, iff that number is in `birth`, resp. `survival`.
+# Rules are written "B<birth>/S<survival>", e.g. "B3/S23" for the Game
+# of Life or "B36/S23" for HighLife, or "<survival>/<birth>" as in
+# older pattern files ("23/3"). A `Rule` is compiled into:
+#
+#  - `table`, the next state of the centre of each 3x3 pattern (a
+#    9-bit mask, row by row, the centre being bit 4), from which the
+#    level 2 table of `forward` is built;
+#  - `decide`, the next states of the cells of a bitboard from the
+#    bitboards of the bits of their numbers of neighbours and of their
+#    states (see `_step`), a function composed from a decision tree on
+#    those bits: for Life, ~c3 & ~c2 & c1 & (c0 | x).
+#
+# Rules with B0 are not supported: empty space would come to life.
+
+class Rule:
+    def __init__(self, rulestring):
+        self.birth, self.survival = Rule._parse(rulestring)
+        if 0 in self.birth:
+            raise ValueError('rules with B0 are not supported: {}'.format(rulestring))
+
+        self.table  = [int(self.next_state((k >> 4) & 1, bin(k & ~(1 << 4)).count('1')))
+                       for k in range(1 << 9)]
+        decide      = Rule._compile(self._tree(3, 0))
+        self.decide = lambda c0, c1, c2, c3, x: decide((c0, c1, c2, c3, x))
+
+    @staticmethod
+    def _parse(rulestring):
+        parts = rulestring.strip().upper().replace(' ', '').split('/')
+        if len(parts) == 2:
+            if parts[0][:1] == 'B' and parts[1][:1] == 'S':
+                birth, survival = parts[0][1:], parts[1][1:]
+            elif parts[0][:1] == 'S' and parts[1][:1] == 'B':
+                survival, birth = parts[0][1:], parts[1][1:]
+            else:
+                survival, birth = parts
+            if all(c in '012345678' for c in birth + survival):
+                return frozenset(map(int, birth)), frozenset(map(int, survival))
+        raise ValueError('invalid rule: {}'.format(rulestring))
+
+    def next_state(self, alive, count):
+        """Next state of a cell with `count` live neighbours"""
+        return count in (self.survival if alive else self.birth)
+
+    def _tree(self, bit, count):
+        # Decision tree once the bits of the count above `bit` are
+        # known: a constant (0, or -1 for "all ones"), or a tuple
+        # (var, high, low) with the trees for var set and unset, var
+        # being a bit of the count (0 to 3) or the cell itself (4).
+        # A count of 8 or more can only be 8.
+        def node(var, high, low):
+            return high if high == low else (var, high, low)
+
+        if bit < 0:
+            count = min(count, 8)
+            return node(4, -int(self.next_state(1, count)), -int(self.next_state(0, count)))
+        return node(bit, self._tree(bit - 1, count | (1 << bit)), self._tree(bit - 1, count))
+
+    @staticmethod
+    def _compile(tree):
+        # Function of the tuple (c0, c1, c2, c3, x) computing `tree`
+        # bitwise, the constants folded away
+        if tree == 0 or tree == -1:
+            return lambda v: tree
+        var, high, low = tree
+        if low == 0:
+            if high == -1:
+                return lambda v: v[var]
+            high = Rule._compile(high)
+            return lambda v: v[var] & high(v)
+        if high == 0:
+            if low == -1:
+                return lambda v: ~v[var]
+            low = Rule._compile(low)
+            return lambda v: ~v[var] & low(v)
+        if high == -1:
+            low = Rule._compile(low)
+            return lambda v: v[var] | low(v)
+        if low == -1:
+            high = Rule._compile(high)
+            return lambda v: ~v[var] | high(v)
+        high, low = Rule._compile(high), Rule._compile(low)
+        return lambda v: (v[var] & high(v)) | (~v[var] & low(v))
+
+    def __str__(self):
+        return 'B{}/S{}'.format(''.join(map(str, sorted(self.birth))),
+                                ''.join(map(str, sorted(self.survival))))
+
+    def __repr__(self):
+        return 'Rule({!r})'.format(str(self))
+
+    def __eq__(self, other):
+        return isinstance(other, Rule) and \
+            (self.birth, self.survival) == (other.birth, other.survival)
+
+    def __hash__(self):
+        return hash((self.birth, self.survival))
+
+LIFE = Rule('B3/S23')
+
+def as_rule(rule):
+    """`rule` as a `Rule`, from a `Rule`, a rulestring or `None` (Life)"""
+    if rule is None:
+        return LIFE
+    return rule if isinstance(rule, Rule) else Rule(rule)
+
+# --------------------------------------------------------------------
+# Memoization of `AbstractNode.forward`
+#
+# The results of `forward` are kept in a `Memo`, per node (a list
+# indexed by the step size `l`, as `forward` is called with at most
+# `level - 1` different steps). A result keeps its whole subtree
+# alive, so the number of memoized nodes is bounded: past `limit`
+# nodes, the least recently used ones are evicted.
+#
+# Results depend on the rule, so that each memo is for one rule, which
+# is the one `forward` uses. Universes without a budget share the
+# module-wide memo of their rule (see `shared_memo`).
+
+class Memo:
+    DEFAULT_LIMIT = 1 << 20
+
+    def __init__(self, limit = DEFAULT_LIMIT, rule = None):
+        assert limit is None or limit > 0
+        self.rule      = as_rule(rule)
+        self.limit     = limit
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+        self._table    = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._table)
+
+    def results(self, node):
+        """The list of memoized results of `node`, or `None`"""
+        return self._table.get(node)
+
+    def get(self, node, l):
+        results = self._table.get(node)
+        if results is None or results[l] is None:
+            self.misses += 1
+            if PROFILE is not None:
+                PROFILE.misses[node.level] += 1
+            return None
+        self.hits += 1
+        if PROFILE is not None:
+            PROFILE.hits[node.level] += 1
+        self._table.move_to_end(node)
+        return results[l]
+
+    def put(self, node, l, result):
+        results = self._table.get(node)
+        if results is None:
+            results = self._table[node] = [None] * (node.level - 1)
+            if self.limit is not None:
+                while len(self._table) > self.limit:
+                    self._table.popitem(last = False)
+                    self.evictions += 1
+        results[l] = result
+        return result
+
+    def items(self):
+        """The memoized nodes with their lists of results, oldest first"""
+        return self._table.items()
+
+    def clear(self):
+        self._table.clear()
+
+    def stats(self):
+        return dict(
+            hits      = self.hits     ,
+            misses    = self.misses   ,
+            evictions = self.evictions,
+            size      = len(self)     ,
+            limit     = self.limit    ,
+            nodes     = len(HC)       ,
+            rule      = str(self.rule),
+        )
+
+MEMOS = {}
+
+def shared_memo(rule = None):
+    """The module-wide memo of `rule` (by default, Life)"""
+    rule = as_rule(rule)
+    if rule not in MEMOS:
+        MEMOS[rule] = Memo(rule = rule)
+    return MEMOS[rule]
+
+MEMO = shared_memo(LIFE)
 
 class Universe:
     def round(self):
@@ -41,10 +309,11 @@ class Universe:
 # Exercise 1
 
 class NaiveUniverse(Universe):
-    def __init__(self, n, m, cells):
+    def __init__(self, n, m, cells, rule = None):
         self.cells = cells
         self.rows = n
         self.cols = m
+        self.rule = as_rule(rule)
                 
     def get_neighbors(self, x, y):
         """Return valid neighbors of the Point as a set.
@@ -61,37 +330,153 @@ class NaiveUniverse(Universe):
         for i in range(self.rows):
             for j in range(self.cols):
                 neighbors = len(self.get_neighbors(i, j))
-                if not self.get(i, j) and neighbors == 3:
+                if not self.get(i, j) and neighbors in self.rule.birth:
                     cells_new[i][j] = True
-                if self.get(i, j) and not neighbors in (2,3):
+                if self.get(i, j) and not neighbors in self.rule.survival:
                     cells_new[i][j] = False
         self.cells = copy.deepcopy(cells_new)
 
     def get(self, i, j):
         return self.cells[i][j]
 
+# --------------------------------------------------------------------
+# Dense universe on NumPy arrays
+#
+# The same universe as `NaiveUniverse` (n x m cells, those outside
+# being dead), with the cells in an array bordered by dead cells. Each
+# round adds up the 8 shifted views of the array and 9 times the cells
+# themselves into `index` (9 * alive + number of live neighbours), and
+# looks the next states up in the table of the rule, into a second
+# array which then becomes the current one.
+
+class NumpyUniverse(Universe):
+    def __init__(self, n, m, cells, rule = None):
+        self.rows = n
+        self.cols = m
+        self.rule = as_rule(rule)
+
+        self._cells = np.zeros((n + 2, m + 2), dtype = np.uint8)
+        self._next  = np.zeros_like(self._cells)
+        self._index = np.zeros((n, m), dtype = np.uint8)
+        self._table = np.array([self.rule.next_state(alive, count)
+                                for alive in (0, 1) for count in range(9)], dtype = np.uint8)
+
+        for i in range(n):
+            self._cells[i + 1, 1:m + 1] = cells[i][:m]
+
+    def round(self):
+        c, index = self._cells, self._index
+        n, m = self.rows, self.cols
+
+        np.multiply(c[1:-1, 1:-1], 9, out = index)
+        for di, dj in ((0, 0), (0, 1), (0, 2), (1, 0), (1, 2), (2, 0), (2, 1), (2, 2)):
+            index += c[di:di + n, dj:dj + m]
+
+        np.take(self._table, index, out = self._next[1:-1, 1:-1])
+        self._cells, self._next = self._next, self._cells
+
+    def get(self, i, j):
+        return bool(self._cells[i + 1, j + 1])
+
+    @property
+    def cells(self):
+        """Boolean array of the cells"""
+        return self._cells[1:-1, 1:-1].astype(bool)
+
+# --------------------------------------------------------------------
+# Dense universe on rows of bits
+#
+# The same universe again, without NumPy: the row i is a single int
+# whose bit j is the cell (i, j). Shifting a row by one bit gives its
+# east and west neighbours, masked to the m columns, and the count of
+# neighbours of a whole row is added up, bit plane by bit plane, from
+# the rows above and below by the full adder of the bitboards (see
+# `_count_planes`), before the rule decides the next row.
+
+class BitRowUniverse(Universe):
+    def __init__(self, n, m, cells, rule = None):
+        self.rows = n
+        self.cols = m
+        self.rule = as_rule(rule)
+
+        self._mask = (1 << m) - 1
+        self._bits = [sum(1 << j for j, alive in enumerate(cells[i][:m]) if alive) for i in range(n)]
+
+    @classmethod
+    def from_points(cls, n, m, points, rule = None):
+        """
+        Universe of n x m cells whose live cells are the pairs (i, j) of
+        `points`, e.g. the points (p.x, p.y) of a Tutorial_8 `Board`
+        """
+        universe = cls(n, m, [[]] * n, rule)
+        for i, j in points:
+            if 0 <= i < n and 0 <= j < m:
+                universe._bits[i] |= 1 << j
+        return universe
+
+    def round(self):
+        mask, decide = self._mask, self.rule.decide
+
+        # Neighbours on the same row (m0 + 2 m1), and 3 cells of the row
+        # (h0 + 2 h1), for each row and for the dead rows around
+        sums = [(0, 0, 0, 0)]
+        for row in self._bits:
+            east, west = (row << 1) & mask, row >> 1
+            m0, m1 = east ^ west, east & west
+            sums.append((m0, m1, m0 ^ row, m1 | (m0 & row)))
+        sums.append((0, 0, 0, 0))
+
+        self._bits = [decide(*_count_planes(m0, m1, s0, s1, n0, n1), row) & mask
+                      for row, (_, _, n0, n1), (m0, m1, _, _), (_, _, s0, s1)
+                      in zip(self._bits, sums, sums[1:], sums[2:])]
+
+    def get(self, i, j):
+        return bool((self._bits[i] >> j) & 1)
+
+    def points(self):
+        """Set of the pairs (i, j) of the live cells"""
+        return {(i, j) for i, row in enumerate(self._bits)
+                       for j in range(row.bit_length()) if (row >> j) & 1}
+
+    @property
+    def cells(self):
+        """Lists of the cells, row by row"""
+        return [[bool((row >> j) & 1) for j in range(self.cols)] for row in self._bits]
+
 # --------------------------------------------------------------------
 
 class AbstractNode:
     BIG = True
-    
+
+    # Nodes are stored in `__slots__` rather than in a per-instance
+    # `__dict__`, and their hash is computed once at creation time:
+    # large universes hold millions of canonical nodes.
+    __slots__ = ('_hash', '__weakref__')
+
+    # Level of this node, and total population of its area
+    level      = None
+    population = None
+
+    nw = ne = sw = se = None
+
     def __init__(self):
-        self._hash = None
-        self._cache = None
+        self._hash = hash((
+            self.population,
+            self.level     ,
+            self.nw        ,
+            self.ne        ,
+            self.sw        ,
+            self.se        ,
+        ))
         
     def __hash__(self):
-        if self._hash is None:
-            self._hash = (
-                self.population,
-                self.level     ,
-                self.nw        ,
-                self.ne        ,
-                self.sw        ,
-                self.se        ,
-            )
-            self._hash = hash(self._hash)
         return self._hash
-        
+
+    def key(self):
+        """Key of the node in the hash-consing table `HC`"""
+        return (self.level, self.population,
+                id(self.nw), id(self.ne), id(self.sw), id(self.se))
+
     def __eq__(self, other):
         if self is other:
             return True
@@ -115,30 +500,18 @@ class AbstractNode:
         if key == (1, 0): return self.sw
         if key == (1, 1): return self.se
         
-    @property
-    def cache(self):
-        return self._cache
-    
-    @property
-    def level(self):
-        """Level of this node"""
-        return None
-
-    @property
-    def population(self):
-        """Total population of the area"""
-        return None
-        
     # ----------------------------------------------------------------
     # Exercise 2
 
     @staticmethod
     def zero(k):
-        if k == 0:
-            return AbstractNode.cell(0)
-        else:
-            quad = AbstractNode.zero(k-1)
-            return AbstractNode.node(quad, quad, quad, quad)
+        while len(ZERO) <= k:
+            if not ZERO:
+                ZERO.append(AbstractNode.cell(0))
+            else:
+                quad = ZERO[-1]
+                ZERO.append(AbstractNode.node(quad, quad, quad, quad))
+        return ZERO[k]
         
     # ----------------------------------------------------------------
     # Exercise 3
@@ -166,7 +539,7 @@ class AbstractNode:
     # ----------------------------------------------------------------
     # Exercise 4, 8 , and 13
     
-    def forward(self, l = None):   
+    def forward(self, l = None, memo = None):   
         
         # ------------------------------------------------------------
         # Exercise 9
@@ -174,71 +547,27 @@ class AbstractNode:
         if self.population == 0:
             return self.zero(self.level - 1)
         
+        if self.level < 2: return None
+
+        memo = MEMO if memo is None else memo
+
+        if self.level == 2:
+            return level2_table(memo.rule)[level2_mask(self)]
+
         l = (self.level - 2) if l is None else l
-        
-        if self.cache is None:
-            self._cache = [None] * (self.level - 1)
-        
-        if self.cache[l] is not None:
-            return self.cache[l]
-        
-        quad_tree = [ [self.nw.nw, self.nw.ne, self.ne.nw, self.ne.ne ], 
-                    [self.nw.sw, self.nw.se, self.ne.sw, self.ne.se ], 
-                    [self.sw.nw, self.sw.ne, self.se.nw, self.se.ne ], 
-                    [self.sw.sw, self.sw.se, self.se.sw, self.se.se ] ]
-        
-        if l == (self.level - 2):
-            
-            if self.level < 2: return None
-            
-            if self.level == 2:
-                temp = 0
-                for i in quad_tree:
-                    for j in i:
-                        temp = (temp << 1) | j.population
-                    
-                self._cache[l] = self.level2_bitmask(temp)
-                return self.cache[l]
-            
-            else:
-                child_quadtree = [[None for i in range(3)] for j in range(3)]
-                for i in range(3):
-                    for j in range(3):
-                        child_quadtree[i][j] = self.get_quadtree(quad_tree, i, j).forward()
-                        
-                quad_tree = child_quadtree
-                
-                child_quadtree = [[None for i in range(2)] for j in range(2)]
-                for i in range(2):
-                    for j in range(2):
-                        child_quadtree[i][j] = self.get_quadtree(quad_tree, i, j).forward()
-                        
-                self.cache[l] = self.get_quadtree(child_quadtree, 0, 0) 
-                return self.cache[l]   
 
-        else:
-            child_quadtree = [[None for i in range(3)] for j in range(3)]
-            for i in range(3):
-                for j in range(3):
-                    child_quadtree[i][j] = self.get_quadtree(quad_tree, i, j).center_uni()
-                    
-            quad_tree = child_quadtree
-            
-            child_quadtree = [[None for i in range(2)] for j in range(2)]
-            for i in range(2):
-                for j in range(2):
-                    child_quadtree[i][j] = self.get_quadtree(quad_tree, i, j).forward(l)
-            
-            self.cache[l] = self.get_quadtree(child_quadtree, 0, 0) 
-            return self.cache[l]  
-            
-    # ----------------------------------------------------------------
+        if self.level == 3:
+            return _leaf_forward(level3_mask(self), l, memo.rule)
+
+        result = memo.get(self, l)
+        if result is not None:
+            return result
 
-    nw = property(lambda self : None)
-    ne = property(lambda self : None)
-    sw = property(lambda self : None)
-    se = property(lambda self : None )
+        if self.level == 4:
+            return memo.put(self, l, _board_forward(self, l, memo.rule))
 
+        return _forward(self, l, memo)
+            
     # ----------------------------------------------------------------
     # Exercise 6
     
@@ -253,14 +582,36 @@ class AbstractNode:
     def cell(alive):
         return hash_consing(CellNode(alive))
     
+    @staticmethod
+    def leaf(bits):
+        """Canonical level 3 node of the 64-bit mask `bits`"""
+        node = HC.get((3, bits))
+        if node is not None:
+            return node
+        return hash_consing(LeafNode(bits))
+
     @staticmethod
     def node(nw, ne, sw, se):
+        # Every canonical level 3 node is a leaf
+        if nw.level == 2:
+            return AbstractNode.leaf(_leaf_bits(level2_mask(nw), level2_mask(ne),
+                                                level2_mask(sw), level2_mask(se)))
+
+        # Look the node up before building it: most calls (in
+        # `forward` for instance) find an existing canonical node.
+        node = HC.get((1 + nw.level,
+                       nw.population + ne.population + sw.population + se.population,
+                       id(nw), id(ne), id(sw), id(se)))
+        if node is not None:
+            return node
         return hash_consing(Node(nw, ne, sw, se))
     
     # ----------------------------------------------------------------
     # Exercise 12 and 13 auxiliary function
     
     def center_uni(self):
+        if self.level == 4:
+            return _centre_leaf(self.nw, self.ne, self.sw, self.se)
         return AbstractNode.node(self.nw.se, self.ne.sw,
                     self.sw.ne, self.se.nw)
     
@@ -275,118 +626,649 @@ class AbstractNode:
         return True
 
 # --------------------------------------------------------------------
-# Exerise 10 auxiliary function
+# Non-recursive evaluation of `AbstractNode.forward`
+#
+# `_forward` runs the same computation as the recursive definition of
+# `forward`, with an explicit stack of frames instead of Python calls,
+# so that deep universes are not limited by the recursion limit. For a
+# node of level k, forwarding by 2^l with l == k-2 first forwards the
+# 9 sub-nodes of level k-1, while l < k-2 simply takes their centres;
+# both then forward the 4 nodes of level k-1 made of those 9 results
+# by 2^(l-1) (resp. 2^l), and join the 4 results.
+#
+# A frame is a list [node, l, step, subs, results, final] where `subs`
+# are the nodes to be forwarded by 2^step in the current phase,
+# `results` their results so far, and `final` tells whether `results`
+# are the 4 quadrants of the result of `node`. Nodes of level 4 are
+# not given frames: they are forwarded on their bitboard (see
+# `_board_forward`).
+
+def _grandchildren(node):
+    """The 4x4 grid of the quadrants of the quadrants of `node`"""
+    nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+    return [ nw.nw, nw.ne, ne.nw, ne.ne,
+             nw.sw, nw.se, ne.sw, ne.se,
+             sw.nw, sw.ne, se.nw, se.ne,
+             sw.sw, sw.se, se.sw, se.se ]
 
-def pos_5(bit):
+def _sub_holding(node, a, b):
     """
-    aux func for level2_bitmask
+    Node of the 3x3 grid of sub-nodes of `node` (see `_frame`) holding
+    a node of level `node.level - 2` at (a, b) from the south-west
+    corner of `node`, and its own position in that sub-node
     """
-    return (( (1 << 3) - 1 ) & (bit))  + \
-            (((bit >> 4) & 1 ) << 3)   + \
-            (((bit >> 6) & 1 ) << 4)   + \
-            (((bit >> 8) & 0b111 ) << 5)
-            
+    shift = node.level - 2
+    c, m  = min(2, a >> shift), min(2, b >> shift)
+    g, i  = _grandchildren(node), 4 * (2 - m) + c
+    return AbstractNode.node(g[i], g[i+1], g[i+4], g[i+5]), a - (c << shift), b - (m << shift)
+
+def _frame(node, l):
+    mknode = AbstractNode.node
+
+    g  = _grandchildren(node)
+    ix = (0, 1, 2, 4, 5, 6, 8, 9, 10)
+
+    if l == node.level - 2:
+        subs = [mknode(g[i], g[i+1], g[i+4], g[i+5]) for i in ix]
+        return [node, l, l - 1, subs, [], False]
+
+    if node.level == 5:
+        centres = [_centre_leaf(g[i], g[i+1], g[i+4], g[i+5]) for i in ix]
+    else:
+        centres = [mknode(g[i].se, g[i+1].sw, g[i+4].ne, g[i+5].nw) for i in ix]
+    return [node, l, l, _join(centres), [], True]
+
+def _join(r):
+    """The 4 nodes made of the 3x3 grid of nodes `r`"""
+    mknode = AbstractNode.node
+    return [ mknode(r[0], r[1], r[3], r[4]),
+             mknode(r[1], r[2], r[4], r[5]),
+             mknode(r[3], r[4], r[6], r[7]),
+             mknode(r[4], r[5], r[7], r[8]) ]
+
+def _forward(node, l, memo):
+    zero  = AbstractNode.zero
+    stack = [_frame(node, l)]
+
+    while True:
+        frame = stack[-1]
+        _, _, step, subs, results, _ = frame
+
+        while len(results) < len(subs):
+            sub = subs[len(results)]
+            if sub.population == 0:
+                results.append(zero(sub.level - 1))
+                continue
+            result = memo.get(sub, step)
+            if result is None:
+                if sub.level > 4:
+                    break
+                result = memo.put(sub, step, _board_forward(sub, step, memo.rule))
+            results.append(result)
+
+        if len(results) < len(subs):
+            stack.append(_frame(sub, step))
+            continue
+
+        if not frame[5]:
+            frame[3], frame[4], frame[5] = _join(results), [], True
+            continue
+
+        result = memo.put(frame[0], frame[1], AbstractNode.node(*results))
+        stack.pop()
+        if not stack:
+            return result
+        stack[-1][4].append(result)
+
 # --------------------------------------------------------------------
-    
+# Level 2 lookup table
+#
+# A level 2 node is a 4x4 pattern, i.e. a 16-bit mask (as built by
+# `level2_mask`), and its result is one of the 16 possible
+# 2x2 centres. We compute all 65536 results once, the first time they
+# are needed, so that the base case of `forward` is a list lookup.
+
+LEVEL1 = None
+LEVEL2 = {}
+
+def level1_table():
+    """
+    The 16 canonical level 1 nodes, indexed by their 4-bit mask
+    (nw, ne, sw, se)
+    """
+    global LEVEL1
+
+    if LEVEL1 is None:
+        cells  = [AbstractNode.cell(0), AbstractNode.cell(1)]
+        LEVEL1 = [AbstractNode.node(cells[(k >> 3) & 1], cells[(k >> 2) & 1],
+                                    cells[(k >> 1) & 1], cells[k & 1])
+                  for k in range(16)]
+
+    return LEVEL1
+
+def level2_node(mask):
+    """
+    Canonical level 2 node of a 16-bit mask (see `level2_mask`)
+    """
+    nodes = level1_table()
+    return AbstractNode.node(
+        nodes[(((mask >> 14) & 0b11) << 2) | ((mask >> 10) & 0b11)],
+        nodes[(((mask >> 12) & 0b11) << 2) | ((mask >>  8) & 0b11)],
+        nodes[(((mask >>  6) & 0b11) << 2) | ((mask >>  2) & 0b11)],
+        nodes[(((mask >>  4) & 0b11) << 2) | ((mask      ) & 0b11)])
+
+def level2_mask(node):
+    """
+    16-bit mask of the 4x4 cells of a level 2 node, row by row
+    """
+    nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+    return \
+        (nw.nw.population << 15) | (nw.ne.population << 14) | \
+        (ne.nw.population << 13) | (ne.ne.population << 12) | \
+        (nw.sw.population << 11) | (nw.se.population << 10) | \
+        (ne.sw.population <<  9) | (ne.se.population <<  8) | \
+        (sw.nw.population <<  7) | (sw.ne.population <<  6) | \
+        (se.nw.population <<  5) | (se.ne.population <<  4) | \
+        (sw.sw.population <<  3) | (sw.se.population <<  2) | \
+        (se.sw.population <<  1) | (se.se.population      )
+
+def _level2_centre(mask, rule):
+    """
+    4-bit mask (nw, ne, sw, se) of the centre of `mask` after one round,
+    `rule` giving the next state of each 3x3 neighbourhood
+    """
+    result = 0
+    for i in (5, 4, 1, 0):
+        result = (result << 1) | rule[ ((mask >> i      ) & 0b111)       |
+                                      (((mask >> i +  4) & 0b111) << 3) |
+                                      (((mask >> i +  8) & 0b111) << 6) ]
+    return result
+
+def level2_table(rule = None):
+    """
+    Table mapping each 4x4 mask to the canonical node of its centre,
+    under `rule` (by default, Life)
+    """
+    rule = as_rule(rule)
+
+    if rule not in LEVEL2:
+        nodes = level1_table()
+        LEVEL2[rule] = [nodes[_level2_centre(mask, rule.table)] for mask in range(1 << 16)]
+
+    return LEVEL2[rule]
+
+def level3_node(mask):
+    """
+    Canonical level 3 node of a 64-bit mask (see `level3_mask`)
+    """
+    return AbstractNode.leaf(mask)
+
+def level3_mask(node):
+    """
+    64-bit mask of the 8x8 cells of a level 3 node, row by row
+    """
+    if isinstance(node, LeafNode):
+        return node.bits
+    return _leaf_bits(*(level2_mask(q) for q in (node.nw, node.ne, node.sw, node.se)))
+
+# --------------------------------------------------------------------
+# Bitboard leaves
+#
+# Canonical level 3 nodes are `LeafNode`s, which store their 8x8 cells
+# as the bits of a 64-bit integer (see `level3_mask`). The base case of
+# `forward` is then a level 4 node: its 4 leaves are put side by side
+# in a 16x16 board of 256 bits, and each round is computed for all the
+# cells of the board at once with a few bitwise operations.
+#
+# The neighbours of the cells are found by shifting the board by one
+# bit (east and west) or one row (north and south). The shifts by one
+# bit wrap the edge columns around to the next row, and those by one
+# row drop the edge rows, so the border of the board is wrong after a
+# round. It would be anyway, as the neighbours outside the board are
+# unknown: after s rounds, the cells at distance at least s from the
+# border are right, which is all `forward` needs.
+
+def _leaf_bits(nw, ne, sw, se):
+    """64-bit mask of the 4 quadrants of 16-bit masks nw, ne, sw, se"""
+    mask = 0
+    for west, east in ((nw, ne), (sw, se)):
+        for shift in (12, 8, 4, 0):
+            mask = (mask << 8) | (((west >> shift) & 0xF) << 4) | ((east >> shift) & 0xF)
+    return mask
+
+def _leaf_quad(bits, r0, c0):
+    """16-bit mask of the 4x4 cells of `bits` from row r0 and column c0"""
+    quad = 0
+    for r in range(r0, r0 + 4):
+        quad = (quad << 4) | ((bits >> (60 - 8 * r - c0)) & 0xF)
+    return quad
+
+def _board(nw, ne, sw, se):
+    """16x16 board of the 4 leaves nw, ne, sw, se"""
+    rows = bytearray(32)
+    rows[ 0:16:2] = level3_mask(nw).to_bytes(8, 'big')
+    rows[ 1:16:2] = level3_mask(ne).to_bytes(8, 'big')
+    rows[16:32:2] = level3_mask(sw).to_bytes(8, 'big')
+    rows[17:32:2] = level3_mask(se).to_bytes(8, 'big')
+    return int.from_bytes(rows, 'big')
+
+def _board_centre(board):
+    """64-bit mask of the 8x8 centre of a 16x16 board"""
+    return int.from_bytes((board >> 4).to_bytes(32, 'big')[9:24:2], 'big')
+
+def _centre_leaf(nw, ne, sw, se):
+    """Canonical leaf at the centre of the 4 leaves nw, ne, sw, se"""
+    return AbstractNode.leaf(_board_centre(_board(nw, ne, sw, se)))
+
+def _step(board, width, rule):
+    """Next round of the `width`x`width` board `board` under `rule`"""
+    east, west = board << 1, board >> 1
+
+    # Neighbours on the same row (m0 + 2 m1), and 3 cells of the row
+    # (h0 + 2 h1)
+    m0, m1 = east ^ west, east & west
+    h0, h1 = m0 ^ board, m1 | (m0 & board)
+
+    # The 3 cells of the rows below and above
+    c0, c1, c2, c3 = _count_planes(m0, m1, h0 << width, h1 << width, h0 >> width, h1 >> width)
+    return rule.decide(c0, c1, c2, c3, board) & ((1 << width * width) - 1)
+
+def _count_planes(m0, m1, s0, s1, n0, n1):
+    """
+    Bit planes c0, c1, c2, c3 of the count m0 + s0 + n0 + 2 (m1 + s1 +
+    n1) of neighbours, from the neighbours on the same row (m0 + 2 m1)
+    and the 3 cells of the rows below (s0 + 2 s1) and above (n0 + 2 n1)
+    """
+    t0 = m0 ^ s0 ^ n0
+    t1 = (s0 & n0) | (m0 & (s0 ^ n0))
+    p, q = t1 ^ m1, t1 & m1
+    r, s = s1 ^ n1, s1 & n1
+    c1, carry = p ^ r, p & r
+    c2 = q ^ s ^ carry
+    c3 = (q & s) | (carry & (q ^ s))
+    return t0, c1, c2, c3
+
+def _leaf_forward(bits, l, rule):
+    """Centre of the leaf `bits` after 2^l rounds (l <= 1) under `rule`"""
+    for _ in range(1 << l):
+        bits = _step(bits, 8, rule)
+    mask = 0
+    for r in range(2, 6):
+        mask = (mask << 4) | ((bits >> (58 - 8 * r)) & 0xF)
+    return level2_node(mask)
+
+def _board_forward(node, l, rule):
+    """Centre of the level 4 node `node` after 2^l rounds (l <= 2) under `rule`"""
+    board = _board(node.nw, node.ne, node.sw, node.se)
+    for _ in range(1 << l):
+        board = _step(board, 16, rule)
+    return AbstractNode.leaf(_board_centre(board))
+
+# --------------------------------------------------------------------
+# Level by level processing of arrays of nodes (see
+# `HashLifeUniverse.build` and `HashLifeUniverse.to_array`)
+
+def _unique_quads(ids, count):
+    """
+    Distinct 2x2 blocks (nw, ne, sw, se) of the square grid `ids` of
+    integers below `count`, and the grid of their indices
+    """
+    k = ids.shape[0] // 2
+    quads = [ids[0::2, 0::2], ids[0::2, 1::2], ids[1::2, 0::2], ids[1::2, 1::2]]
+
+    if count ** 4 < 1 << 63:
+        keys = np.zeros((k, k), dtype = np.int64)
+        for quad in quads:
+            keys = keys * count + quad
+        keys, inverse = np.unique(keys, return_inverse = True)
+        values = np.stack([keys // count ** 3, keys // count ** 2 % count,
+                           keys // count % count, keys % count], axis = -1)
+    else:
+        values, inverse = np.unique(np.stack(quads, axis = -1).reshape(-1, 4),
+                                    axis = 0, return_inverse = True)
+
+    return values.tolist(), inverse.reshape(k, k)
+
+def _rasters(nodes, level):
+    """
+    Array of shape (len(nodes), 2^level, 2^level) of the cells of the
+    level `level` nodes `nodes`
+    """
+    if level < 2:
+        return np.array([[[n.alive]] if level == 0 else
+                         [[n.nw.alive, n.ne.alive], [n.sw.alive, n.se.alive]]
+                         for n in nodes], dtype = bool)
+
+    ids  = np.arange(len(nodes)).reshape(-1, 1, 1)
+    base = min(level, 3)
+
+    while level > base:
+        index, children = {}, []
+        for node in nodes:
+            for quad in (node.nw, node.ne, node.sw, node.se):
+                children.append(index.setdefault(quad, len(index)))
+        u, k  = ids.shape[:2]
+        ids   = np.array(children).reshape(-1, 4)[ids]
+        ids   = ids.reshape(u, k, k, 2, 2).transpose(0, 1, 3, 2, 4).reshape(u, 2*k, 2*k)
+        nodes = list(index)
+        level -= 1
+
+    if base == 3:
+        masks, side = np.array([level3_mask(node) for node in nodes], dtype = '>u8'), 8
+    else:
+        masks, side = np.array([level2_mask(node) for node in nodes], dtype = '>u2'), 4
+    cells = np.unpackbits(masks.view(np.uint8)).reshape(-1, side, side)[ids]
+    u, k  = ids.shape[:2]
+
+    return cells.transpose(0, 1, 3, 2, 4).reshape(u, side*k, side*k).astype(bool)
+
+# --------------------------------------------------------------------
+
 class CellNode(AbstractNode):
+    __slots__ = ('alive', 'population')
+
+    level = 0
+
     def __init__(self, alive):
+        self.alive      = bool(alive)
+        self.population = int(self.alive)
         super().__init__()
-        self._alive = bool(alive)
 
-    level      = property(lambda self : 0)
-    population = property(lambda self : int(self._alive))
-    alive      = property(lambda self : self._alive)
+
+class LeafNode(AbstractNode):
+    """
+    Level 3 node whose 8x8 cells are the bits of `bits` (see
+    `level3_mask`). Its quadrants are only built when asked for.
+    """
+    __slots__ = ('bits', 'population')
+
+    level = 3
+
+    def __init__(self, bits):
+        self.bits       = bits
+        self.population = bin(bits).count('1')
+        self._hash      = hash((self.population, self.level, bits))
+
+    def key(self):
+        return (self.level, self.bits)
+
+    def __eq__(self, other):
+        if isinstance(other, LeafNode):
+            return self.bits == other.bits
+        return super().__eq__(other)
+
+    __hash__ = AbstractNode.__hash__
+
+    nw = property(lambda self: level2_node(_leaf_quad(self.bits, 0, 0)))
+    ne = property(lambda self: level2_node(_leaf_quad(self.bits, 0, 4)))
+    sw = property(lambda self: level2_node(_leaf_quad(self.bits, 4, 0)))
+    se = property(lambda self: level2_node(_leaf_quad(self.bits, 4, 4)))
 
 
 class Node(AbstractNode):
-    def __init__(self, nw, ne, sw, se):
-        super().__init__()
+    __slots__ = ('level', 'population', 'nw', 'ne', 'sw', 'se')
 
-        self._level      = 1 + nw.level
-        self._population = nw.population + ne.population + sw.population + se.population
-        self._nw = nw
-        self._ne = ne
-        self._sw = sw
-        self._se = se
+    def __init__(self, nw, ne, sw, se):
+        self.level      = 1 + nw.level
+        self.population = nw.population + ne.population + sw.population + se.population
+        self.nw = nw
+        self.ne = ne
+        self.sw = sw
+        self.se = se
+        self._hash = hash((self.population, self.level,
+                           nw._hash, ne._hash, sw._hash, se._hash))
             
     # ----------------------------------------------------------------
     # Exercise 10
 
     @staticmethod
     def level2_bitmask(mask):
-        
-        vals = [5,6,9,10]
-        temp = []
-        
-        for i in vals:
-            num = pos_5(mask >> i-5)
-            count = 0
-            while (num):
-                count += num & 1
-                num >>= 1
-            if mask >> i & 1:
-                if count not in (2,3): temp.append(0)
-                else: temp.append(1)
-            else:
-                if count == 3: temp.append(1)
-                else: temp.append(0)
-        
-        return AbstractNode.node(
-                    AbstractNode.cell(temp[3]), 
-                    AbstractNode.cell(temp[2]), 
-                    AbstractNode.cell(temp[1]), 
-                    AbstractNode.cell(temp[0]))
-    
-    # ----------------------------------------------------------------
-    
-    level      = property(lambda self : self._level)
-    population = property(lambda self : self._population)
-
-    nw = property(lambda self : self._nw)
-    ne = property(lambda self : self._ne)
-    sw = property(lambda self : self._sw)
-    se = property(lambda self : self._se)
+        return level2_table()[mask]
 
 # --------------------------------------------------------------------
 
 class HashLifeUniverse(Universe):
-    def __init__(self, *args):
+    def __init__(self, *args, budget = None, rule = None):
+        """
+        The universe evolves under `rule` (a `Rule` or a rulestring,
+        by default Life). `budget`, if given, is the maximum number of
+        nodes whose `forward` results are memoized for this universe.
+        Otherwise, the universe shares the module-wide memo of its rule
+        (see `shared_memo`).
+        """
         if len(args) == 1:
             self._root = args[0]
         else:
             self._root = HashLifeUniverse.load(*args)
 
         self._generation = 0
+        self._memo = shared_memo(rule) if budget is None else Memo(budget, rule)
+
+        # Coordinates of the centre of the root (see `compact`)
+        self._origin = (0, 0)
 
     @staticmethod
     def load(n, m, cells):
         level = math.ceil(math.log(max(1, n, m), 2))
+        array = np.zeros((n, m), dtype = bool)
 
-        mkcell = getattr(AbstractNode, 'cell', CellNode)
-        mknode = getattr(AbstractNode, 'node', Node    )
+        for i in range(n):
+            array[i, :] = cells[i][:m]
 
-        def get(i, j):
-            i, j = i + n // 2, j + m // 2
-            return \
-                i in range(n) and \
-                j in range(m) and \
-                cells[i][j]
-                
-        def create(i, j, level):
-            if level == 0:
-                return mkcell(get (i, j))
+        return HashLifeUniverse.build(array, level)
 
-            noffset = 1 if level < 2 else 1 << (level - 2)
-            poffset = 0 if level < 2 else 1 << (level - 2)
+    # ----------------------------------------------------------------
+    # Bulk conversion from and to NumPy arrays
+    #
+    # In both directions, the tree is processed level by level on whole
+    # arrays of nodes rather than cell by cell: `build` computes the 8x8
+    # masks of all the blocks at once, and only creates one canonical
+    # node per distinct block (or group of 4 blocks on the next level).
+    # `to_array` descends into the non-empty nodes of the requested area
+    # down to tiles of level `RASTER_LEVEL`, then expands all the tiles
+    # together down to their 8x8 masks.
+    #
+    # In both, arrays are in "picture" order (north row first, west
+    # column first), which is the order of the quadrants of a node.
 
-            nw = create(i-noffset, j+poffset, level - 1)
-            sw = create(i-noffset, j-noffset, level - 1)
-            ne = create(i+poffset, j+poffset, level - 1)
-            se = create(i+poffset, j-noffset, level - 1)
-            
-            return mknode(nw=nw, ne=ne, sw=sw, se=se)
-                
-        return create(0, 0, level)
+    RASTER_LEVEL = 6
+
+    @staticmethod
+    def build(cells, level = None):
+        """
+        Root node of level `level` (by default, the smallest that
+        fits) for the boolean array `cells`, placed as by `load`
+        """
+        n, m = cells.shape
+        if level is None:
+            level = math.ceil(math.log(max(1, n, m), 2))
+
+        size    = 1 << level
+        x0, y0  = size // 2 - n // 2, size // 2 - m // 2
+        picture = np.zeros((size, size), dtype = bool)
+        picture[size-y0-m:size-y0, x0:x0+n] = np.asarray(cells, dtype = bool).T[::-1]
+
+        if level < 2:
+            def create(p):
+                if p.shape == (1, 1):
+                    return AbstractNode.cell(p[0, 0])
+                h = p.shape[0] // 2
+                return AbstractNode.node(create(p[:h, :h]), create(p[:h, h:]),
+                                         create(p[h:, :h]), create(p[h:, h:]))
+            return create(picture)
+
+        side  = 8 if level > 2 else 4
+        k     = size // side
+        masks = picture.reshape(k, side, k, side).transpose(0, 2, 1, 3).reshape(k, k, side*side)
+        masks = np.packbits(masks, axis = -1).view('>u8' if side == 8 else '>u2')[..., 0]
+
+        values, ids = np.unique(masks, return_inverse = True)
+        block = level3_node if side == 8 else level2_node
+        nodes = [block(int(mask)) for mask in values]
+        ids   = ids.reshape(k, k)
+
+        while k > 1:
+            k //= 2
+            values, ids = _unique_quads(ids, len(nodes))
+            nodes = [AbstractNode.node(nodes[a], nodes[b], nodes[c], nodes[d])
+                     for a, b, c, d in values]
+
+        return nodes[ids[0, 0]]
+
+    @classmethod
+    def from_array(cls, cells, **kwargs):
+        """
+        Universe whose cell (i - n // 2, j - m // 2) is `cells[i, j]`,
+        for a boolean array `cells` of shape (n, m)
+        """
+        return cls(HashLifeUniverse.build(np.asarray(cells, dtype = bool)), **kwargs)
+
+    def bbox(self):
+        """
+        Area (imin, jmin, imax, jmax) covered by the root, `imax` and
+        `jmax` excluded
+        """
+        size = 1 << self._root.level
+        x, y = self._origin
+        return (x - (size >> 1), y - (size >> 1),
+                x - (size >> 1) + size, y - (size >> 1) + size)
+
+    def to_array(self, bbox = None):
+        """
+        Boolean array `a` of the cells of `bbox` (by default, the area
+        of the root) such that a[i - imin, j - jmin] == self.get(i, j)
+        """
+        return self._to_array(self.bbox() if bbox is None else bbox, {})
+
+    def _to_array(self, bbox, rasters):
+        """`to_array`, `rasters` keeping the rasters of tiles between calls"""
+        imin, jmin, imax, jmax = bbox
+        picture = np.zeros((max(0, jmax - jmin), max(0, imax - imin)), dtype = bool)
+
+        # Non-empty tiles intersecting the area, with their west and
+        # south coordinates
+        tiles = []
+        level = min(self._root.level, HashLifeUniverse.RASTER_LEVEL)
+
+        def collect(node, left, bottom):
+            size = 1 << node.level
+            if node.population == 0          or \
+               left   >= imax or left   + size <= imin or \
+               bottom >= jmax or bottom + size <= jmin:
+                return
+            if node.level == level:
+                tiles.append((node, left, bottom))
+                return
+            h = size // 2
+            collect(node.nw, left    , bottom + h)
+            collect(node.ne, left + h, bottom + h)
+            collect(node.sw, left    , bottom    )
+            collect(node.se, left + h, bottom    )
+
+        collect(self._root, *self.bbox()[:2])
+
+        missing = list(dict.fromkeys(node for node, _, _ in tiles if node not in rasters))
+        if missing:
+            rasters.update(zip(missing, _rasters(missing, level)))
+
+        size = 1 << level
+        for node, left, bottom in tiles:
+            i0, i1 = max(left  , imin), min(left   + size, imax)
+            j0, j1 = max(bottom, jmin), min(bottom + size, jmax)
+            top    = bottom + size
+            picture[jmax-j1:jmax-j0, i0-imin:i1-imin] = \
+                rasters[node][top-j1:top-j0, i0-left:i1-left]
+
+        return picture[::-1].T.copy()
+
+    @staticmethod
+    def build_cells(cells):
+        """
+        Root node (of level at least 4) whose live cells are the
+        coordinates (i, j) of the iterable `cells`. The tree is built
+        from the 8x8 blocks of live cells up, without ever storing the
+        empty parts of the area.
+        """
+        blocks = {}
+        for i, j in cells:
+            key = (i >> 3, j >> 3)
+            blocks[key] = blocks.get(key, 0) | (1 << (63 - 8 * (7 - (j & 7)) - (i & 7)))
+
+        extent = max((max(-x, x + 1, -y, y + 1) for x, y in blocks), default = 1)
+        level  = 4 + (extent - 1).bit_length()
+        nodes  = { key: AbstractNode.leaf(bits) for key, bits in blocks.items() }
+
+        for k in range(3, level - 1):
+            zero  = AbstractNode.zero(k)
+            nodes = { (x, y): AbstractNode.node(nodes.get((2*x  , 2*y+1), zero),
+                                                nodes.get((2*x+1, 2*y+1), zero),
+                                                nodes.get((2*x  , 2*y  ), zero),
+                                                nodes.get((2*x+1, 2*y  ), zero))
+                      for x, y in { (x >> 1, y >> 1) for x, y in nodes } }
+
+        zero = AbstractNode.zero(level - 1)
+        return AbstractNode.node(nodes.get((-1,  0), zero), nodes.get((0,  0), zero),
+                                 nodes.get((-1, -1), zero), nodes.get((0, -1), zero))
+
+    @classmethod
+    def from_cells(cls, cells, **kwargs):
+        """
+        Universe whose live cells are the coordinates (i, j) of `cells`
+        """
+        return cls(HashLifeUniverse.build_cells(cells), **kwargs)
+
+    def live_bbox(self):
+        """
+        Smallest area (imin, jmin, imax, jmax) containing all the live
+        cells (`imax` and `jmax` excluded), or `None` if there are none
+        """
+        root = self._root
+        if root.population == 0:
+            return None
+
+        # Distance from one side of a node to its closest live cell,
+        # `near` and `far` giving the quadrants along that side and
+        # along the opposite one, and `leaf` the distance within the
+        # mask of a leaf. It only depends on the node, hence is
+        # memoized for each side.
+        def distance(node, near, far, leaf, memo):
+            if isinstance(node, LeafNode):
+                return leaf(node.bits)
+            if node.level == 0:
+                return 0
+            d = memo.get(node)
+            if d is None:
+                quads = [q for q in near(node) if q.population]
+                d = 0
+                if not quads:
+                    quads = [q for q in far(node) if q.population]
+                    d = 1 << (node.level - 1)
+                d += min(distance(q, near, far, leaf, memo) for q in quads)
+                memo[node] = d
+            return d
+
+        # Columns of a leaf holding live cells, the west one first
+        def columns(bits):
+            bits |= bits >> 32
+            bits |= bits >> 16
+            bits |= bits >> 8
+            return bits & 0xFF
+
+        west  = lambda n: (n.nw, n.sw)
+        east  = lambda n: (n.ne, n.se)
+        south = lambda n: (n.sw, n.se)
+        north = lambda n: (n.nw, n.ne)
+
+        sides = (
+            (west , east , lambda b: 8 - columns(b).bit_length()),
+            (south, north, lambda b: ((b & -b).bit_length() - 1) // 8),
+            (east , west , lambda b: (columns(b) & -columns(b)).bit_length() - 1),
+            (north, south, lambda b: (64 - b.bit_length()) // 8),
+        )
+
+        imin, jmin, imax, jmax = self.bbox()
+        dw, ds, de, dn = (distance(root, *side, {}) for side in sides)
+        return (imin + dw, jmin + ds, imax - de, jmax - dn)
 
     # ----------------------------------------------------------------
     # Exercise 11
@@ -395,27 +1277,34 @@ class HashLifeUniverse(Universe):
         
         node = self._root
         level = node.level
-        size = np.power(2, level)
+        half = (1 << level) >> 1
+
+        x, y = self._origin
+        i, j = i - x, j - y
         
-        if -size <= min(i, j) and max(i, j) < size:
+        if not (-half <= min(i, j) and max(i, j) < max(half, 1)):
+            return False
             
-            while level!=0:
-                
-                x = 1 if j >= 0 else 0
-                y = 1 if i >= 0 else 0
-                
-                l = [-1 if level < 2 else - np.power(2, level - 2), 0 if level < 2 else np.power(2, level - 2) ]
-                
-                i -= l[y]
-                j -= l[x]
-                
-                node = node.get_quad((1 - x, y))
-                
-                level -= 1
+        while level != 0:
+
+            if level == 3 and isinstance(node, LeafNode):
+                return bool((node.bits >> (63 - 8 * (3 - j) - (i + 4))) & 1)
+
+            # Coordinates relative to the centre of the quadrant (those
+            # of the single cells of level 1 nodes do not matter)
+            offset = (1 << level) >> 2
+            
+            i, east  = (i - offset, True ) if i >= 0 else (i + offset, False)
+            j, north = (j - offset, True ) if j >= 0 else (j + offset, False)
+            
+            if north:
+                node = node.ne if east else node.nw
+            else:
+                node = node.se if east else node.sw
             
-            return node.alive
+            level -= 1
         
-        return False
+        return node.alive
 
 
     # ----------------------------------------------------------------
@@ -434,23 +1323,267 @@ class HashLifeUniverse(Universe):
     # ----------------------------------------------------------------
     # Exercise 14
     
+    #
+    # The root is sized once for the whole jump: as the live cells
+    # spread by at most one cell per round, those of the next n rounds
+    # stay within `live_bbox` grown by n, hence in the centre of a root
+    # of level L as soon as that area fits in [-2^(L-2), 2^(L-2)) --
+    # then 2^i <= n also fits the steps `forward` allows. Each set bit
+    # i of n is one `forward(i)` of the root, whose result (its centre)
+    # is extended back to level L with canonical empty quadrants.
+    # Finally, the root is cropped back to its initial level, or to
+    # the smallest one that still contains the pattern, and compacted
+    # if the pattern has drifted away from its centre.
+
     def rounds(self, n):
-        i = 0
-        while np.power(2, i) <= n:
-            if (n >> i) & 1:
-                self.extend(i+2)
-                self._root = self.root.extend()
-                self._root = self.root.forward(i)
-            i += 1
-            
+        root, level = self._root, self._root.level
+
+        if n > 0 and root.population:
+            imin, jmin, imax, jmax = self.live_bbox()
+            x, y  = self._origin
+            reach = max(x - imin, y - jmin, imax - x, jmax - y) + n
+            while root.level < 2 + (reach - 1).bit_length():
+                root = root.extend()
+
+            profile, generation = PROFILE, self._generation
+            for i in range(n.bit_length()):
+                if (n >> i) & 1:
+                    if profile is not None:
+                        start, nodes = time.perf_counter(), sum(profile.nodes.values())
+                    root = root.forward(i, self._memo).extend()
+                    if profile is not None:
+                        profile.step(generation, i, root.level, time.perf_counter() - start,
+                                     sum(profile.nodes.values()) - nodes, len(self._memo))
+                    generation += 1 << i
+
+            while root.level > max(level, 2) and not root.peripheral_alive():
+                root = root.center_uni()
+
+        self._root = root
         self._generation += n
 
+        root, origin = self._compacted()
+        if self._root.level - root.level >= HashLifeUniverse.COMPACT_LEVELS:
+            self._root, self._origin = root, origin
+
+    # ----------------------------------------------------------------
+    # Compaction
+    #
+    # The root only holds the live cells around its centre, and the
+    # planner of `rounds` sizes it from there: once a pattern has
+    # drifted away (a spaceship, say), every step works on a tree much
+    # deeper than the pattern needs. `compact` re-roots the universe at
+    # the smallest node of the tree holding all the live cells -- one
+    # of the quadrants of the root or of the 5 nodes straddling them,
+    # recursively -- and moves its origin (the coordinates of the
+    # centre of the root) along, so that cells keep their coordinates.
+    # `rounds` compacts the universe when it saves `COMPACT_LEVELS`
+    # levels or more.
+
+    COMPACT_LEVELS = 2
+
+    # Positions (row, column) in the grid of grandchildren of the nodes
+    # of the previous level, the centre first
+    _SUBS = ((1, 1), (0, 0), (0, 1), (0, 2), (1, 0), (1, 2), (2, 0), (2, 1), (2, 2))
+
+    def _compacted(self):
+        """Smallest node (of level 3 or more) holding the live cells, and its centre"""
+        root, (x, y) = self._root, self._origin
+
+        while root.level > 3 and root.population:
+            g = _grandchildren(root)
+            for r, c in HashLifeUniverse._SUBS:
+                quads = (g[4*r+c], g[4*r+c+1], g[4*r+c+4], g[4*r+c+5])
+                if sum(q.population for q in quads) == root.population:
+                    break
+            else:
+                break
+            shift = 1 << (root.level - 2)
+            root  = AbstractNode.node(*quads)
+            x, y  = x + (c - 1) * shift, y - (r - 1) * shift
+
+        return root, (x, y)
+
+    def compact(self):
+        """
+        Re-root the universe at the smallest node holding all its live
+        cells, without moving them
+        """
+        self._root, self._origin = self._compacted()
+
+    @property
+    def origin(self):
+        return self._origin
+
+    # ----------------------------------------------------------------
+    # Frames
+    #
+    # `frames` streams the pictures of a viewport along the evolution
+    # of the universe. Each frame is rendered as by `to_array`, which
+    # only descends into the non-empty nodes crossing the viewport, and
+    # the rasters of the tiles are kept from one frame to the next (up
+    # to `FRAME_TILES` of them): the parts of the pattern that do not
+    # change, or only move by a multiple of the size of the tiles, are
+    # not rasterized again.
+
+    FRAME_TILES = 1 << 12
+
+    def frames(self, bbox, every = 1, count = None):
+        """
+        Generator of the arrays of the cells of `bbox` (see
+        `to_array`) now and every `every` generations after, `count`
+        of them (by default, forever). The universe evolves with them.
+        """
+        rasters = {}
+        while count is None or count > 0:
+            if len(rasters) > HashLifeUniverse.FRAME_TILES:
+                rasters.clear()
+            yield self._to_array(bbox, rasters)
+            if count is not None:
+                count -= 1
+                if count == 0:
+                    return
+            self.rounds(every)
+
+    # ----------------------------------------------------------------
+    # Cycle detection
+    #
+    # Two states are the same pattern up to a translation iff they have
+    # the same canonical node of level k whose south-west corner is
+    # that of the smallest area holding the live cells (2^k being the
+    # first power of 2 above its size), which is a test of identity, and
+    # the translation is the difference of the corners. The node is cut
+    # out of the tree by `_window`, down to the bitboards of leaves,
+    # which costs about as much as a round: it is only cut out when the
+    # population and the size of the live cells (the shape, from the
+    # root and `live_bbox`) already match. As long as gliders fly away
+    # the shape never matches, and `cycle` gives up once the live cells
+    # outgrow `size`; a 12x12 soup sending gliders away took 14 s to
+    # reach 4096 rounds when every state was cut out.
+    # Brent's algorithm finds the period while only keeping one earlier
+    # state, and a second pass, one copy of the universe being `period`
+    # rounds ahead of the other, finds the start of the cycle.
+
+    Cycle = collections.namedtuple('Cycle', 'start period displacement')
+
+    def _window(self, x, y, k):
+        """Canonical node of level k >= 3 whose south-west cell is (x, y)"""
+        root, (cx, cy) = self._root, self._origin
+        while True:
+            half = 1 << root.level >> 1
+            a, b = x - (cx - half), y - (cy - half)
+            if root.level > k and min(a, b) >= 0 and max(a, b) + (1 << k) <= 2 * half:
+                break
+            root = root.extend()
+
+        # Node of level k+1 holding the window, at (a, b) from its corner
+        while root.level > k + 1:
+            root, a, b = _sub_holding(root, a, b)
+
+        memo = {}
+
+        def window(node, a, b):
+            if node.population == 0:
+                return AbstractNode.zero(node.level - 1)
+            if (node, a, b) in memo:
+                return memo[node, a, b]
+            if node.level == 4:
+                board = _board(node.nw, node.ne, node.sw, node.se)
+                bits  = 0
+                for r in range(8 - b, 16 - b):
+                    bits = (bits << 8) | ((board >> (16 * (15 - r) + 8 - a)) & 0xFF)
+                result = AbstractNode.leaf(bits)
+            else:
+                h = 1 << (node.level - 2)
+                result = AbstractNode.node(*(window(*_sub_holding(node, a + da, b + db))
+                                             for da, db in ((0, h), (h, h), (0, 0), (h, 0))))
+            memo[node, a, b] = result
+            return result
+
+        return window(root, a, b)
+
+    def _shape(self):
+        """Population, width and height of the live cells, and their corner"""
+        bbox = self.live_bbox()
+        if bbox is None:
+            return (0, 0, 0), (0, 0)
+        imin, jmin, imax, jmax = bbox
+        return (self._root.population, imax - imin, jmax - jmin), (imin, jmin)
+
+    def _same(self, shape, corner, other, other_corner):
+        """Whether two states of shapes `shape` are the same pattern"""
+        if shape[0] == 0:
+            return True
+        k = max(3, (max(shape[1:]) - 1).bit_length())
+        return self._window(*corner, k) is other._window(*other_corner, k)
+
+    def _copy(self):
+        universe = HashLifeUniverse(self._root)
+        universe._memo, universe._origin, universe._generation = \
+            self._memo, self._origin, self._generation
+        return universe
+
+    def cycle(self, limit = 1 << 12, size = None):
+        """
+        Cycle (start, period, displacement) of the evolution of the
+        universe: after `start` rounds, its live cells come back every
+        `period` rounds, moved by `displacement` (0, 0 for oscillators
+        and still lifes). `None` if no cycle is found in `limit` rounds,
+        or as soon as the live cells spread over more than `size` cells
+        in some direction (e.g. when gliders fly away). The universe
+        itself is left unchanged.
+        """
+        hare = self._copy()
+        tortoise, (shape, corner) = hare._copy(), hare._shape()
+        hare.round()
+        hare_shape, hare_corner = hare._shape()
+        power = period = 1
+
+        while hare_shape != shape or \
+              not hare._same(shape, hare_corner, tortoise, corner):
+            if hare.generation - self.generation >= limit:
+                return None
+            if size is not None and max(hare_shape[1:]) > size:
+                return None
+            if power == period:
+                tortoise, shape, corner = hare._copy(), hare_shape, hare_corner
+                power, period = 2 * power, 0
+            hare.round()
+            hare_shape, hare_corner = hare._shape()
+            period += 1
+
+        displacement = (hare_corner[0] - corner[0], hare_corner[1] - corner[1])
+
+        tortoise, hare, start = self._copy(), self._copy(), 0
+        hare.rounds(period)
+        while True:
+            (shape, corner), (hare_shape, hare_corner) = tortoise._shape(), hare._shape()
+            if shape == hare_shape and hare._same(shape, hare_corner, tortoise, corner):
+                break
+            tortoise.round()
+            hare.round()
+            start += 1
+
+        return HashLifeUniverse.Cycle(start, period, displacement)
+
     def round(self):
         return self.rounds(1)
 
     @property
     def root(self):
         return self._root
+
+    @property
+    def memo(self):
+        return self._memo
+
+    @property
+    def rule(self):
+        return self._memo.rule
+
+    def cache_stats(self):
+        """Hits, misses and evictions of the memo of `forward`"""
+        return self._memo.stats()
         
     @property
     def generation(self):
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+Title: Pattern files for the HashLife universe
+
+Readers and writers for the two usual pattern formats:
+
+ - RLE, the run-length encoded picture of the pattern,
+ - Macrocell, a dump of the (hash-consed) quadtree itself, in which
+   every distinct node is written once.
+
+Both readers work line by line on a text stream and build the tree
+directly with `AbstractNode.node` and `AbstractNode.cell`, without
+ever expanding the pattern to a full grid.
+
+The boards of CSE101/Tutorial_8 and random soups are given as
+(width, height, live cells) rather than as universes, so that they
+can be run by the bounded engines too.
+"""
+
+import random
+
+from hashlife import AbstractNode, HashLifeUniverse, Rule, level3_mask, level3_node
+
+# --------------------------------------------------------------------
+class InvalidPattern(Exception):
+    pass
+
+def _rule(rulestring):
+    try:
+        return Rule(rulestring)
+    except ValueError as e:
+        raise InvalidPattern(str(e))
+
+# --------------------------------------------------------------------
+# RLE
+#
+# The header line `x = <width>, y = <height>[, rule = <rule>]` is
+# followed by runs `<count><tag>` where the tag is `b` (dead cells),
+# `o` (live cells) or `$` (end of row), up to a final `!`. Rows go
+# from north to south, and the pattern is placed as by
+# `HashLifeUniverse.load`: its row r and column c is the cell
+# (c - width // 2, height - 1 - r - height // 2).
+
+def _rle_header(line):
+    fields = {}
+    for field in line.split(','):
+        key, _, value = field.partition('=')
+        fields[key.strip()] = value.strip()
+    try:
+        return int(fields['x']), int(fields['y']), fields.get('rule')
+    except (KeyError, ValueError):
+        raise InvalidPattern('invalid RLE header: {}'.format(line.strip()))
+
+def _rle_cells(lines, width, height):
+    """The live cells of the RLE pattern of `lines`, after the header"""
+    row, col, count = 0, 0, ''
+
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        for c in line:
+            if c.isdigit():
+                count += c
+                continue
+            n, count = int(count or 1), ''
+            if c == '!':
+                return
+            if c == '$':
+                row, col = row + n, 0
+            elif c in 'b.':
+                col += n
+            elif not c.isspace():
+                for x in range(col, col + n):
+                    yield (x - width // 2, height - 1 - row - height // 2)
+                col += n
+
+def read_rle(stream, rule = None):
+    """
+    HashLife universe of the RLE pattern read from `stream`, under its
+    own rule or else `rule` (by default, Life)
+    """
+    lines = iter(stream)
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            break
+    else:
+        raise InvalidPattern('missing RLE header')
+
+    width, height, rulestring = _rle_header(line)
+    rule = rule if rulestring is None else _rule(rulestring)
+    return HashLifeUniverse.from_cells(_rle_cells(lines, width, height), rule = rule)
+
+def write_rle(universe, stream, band = 64):
+    """
+    Write the live cells of `universe` to `stream` in RLE. The pattern
+    is rasterized `band` rows at a time.
+    """
+    bbox = universe.live_bbox()
+    if bbox is None:
+        stream.write('x = 0, y = 0, rule = {}\n!\n'.format(universe.rule))
+        return
+
+    imin, jmin, imax, jmax = bbox
+    stream.write('x = {}, y = {}, rule = {}\n'.format(imax - imin, jmax - jmin, universe.rule))
+
+    line, rows = [], 0
+
+    def emit(n, tag):
+        token = (str(n) if n > 1 else '') + tag
+        if sum(map(len, line)) + len(token) > 70:
+            stream.write(''.join(line) + '\n')
+            line.clear()
+        line.append(token)
+
+    for top in range(jmax, jmin, -band):
+        cells = universe.to_array((imin, max(jmin, top - band), imax, top))
+        for row in cells.T[::-1]:
+            runs, x = [], 0
+            while x < len(row):
+                y = x
+                while y < len(row) and row[y] == row[x]:
+                    y += 1
+                runs.append((y - x, 'o' if row[x] else 'b'))
+                x = y
+            if runs[-1][1] == 'b':
+                runs.pop()
+            if not runs:
+                rows += 1
+                continue
+            if rows:
+                emit(rows, '$')
+            for n, tag in runs:
+                emit(n, tag)
+            rows = 1
+
+    emit(1, '!')
+    stream.write(''.join(line) + '\n')
+
+# --------------------------------------------------------------------
+# Macrocell
+#
+# After the `[M2]` header and `#` comments, each line is a node,
+# numbered from 1 in order of appearance:
+#
+#  - a leaf (8x8 cells) is written as its rows from north to south,
+#    with `.` for dead cells and `*` for live ones, each row ended by
+#    `$` (trailing dead cells and empty rows are left out);
+#  - a larger node is written `k nw ne sw se`, where 2^k is its size
+#    and its quadrants are given by their numbers, 0 for empty.
+#
+# The last node is the root, which we centre as the roots of
+# `HashLifeUniverse`. `#G` gives the generation of the universe, and
+# `#O x y` the coordinates of the centre of the root (see
+# `HashLifeUniverse.origin`), (0, 0) if absent.
+
+def _leaf(line):
+    mask, row, col = 0, 0, 0
+    for c in line:
+        if c == '$':
+            row, col = row + 1, 0
+            continue
+        if row >= 8 or col >= 8 or c not in '.*':
+            raise InvalidPattern('invalid Macrocell leaf: {}'.format(line))
+        if c == '*':
+            mask |= 1 << (63 - 8 * row - col)
+        col += 1
+    return level3_node(mask)
+
+def read_macrocell(stream, rule = None):
+    """
+    HashLife universe of the Macrocell dump read from `stream`, under
+    its own rule or else `rule` (by default, Life)
+    """
+    nodes, generation, origin = [None], 0, (0, 0)
+
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith('['):
+            continue
+        if line.startswith('#'):
+            if line.startswith('#R'):
+                rule = _rule(line[2:])
+            elif line.startswith('#G'):
+                generation = int(line[2:])
+            elif line.startswith('#O'):
+                try:
+                    x, y   = map(int, line[2:].split())
+                    origin = (x, y)
+                except ValueError:
+                    raise InvalidPattern('invalid Macrocell origin: {}'.format(line))
+            continue
+
+        if line[0] in '.*$':
+            nodes.append(_leaf(line))
+            continue
+
+        try:
+            k, *quads = map(int, line.split())
+            zero  = AbstractNode.zero(k - 1)
+            quads = [nodes[q] if q else zero for q in quads]
+        except (ValueError, IndexError):
+            raise InvalidPattern('invalid Macrocell node: {}'.format(line))
+        if len(quads) != 4 or k < 4 or any(q.level != k - 1 for q in quads):
+            raise InvalidPattern('invalid Macrocell node: {}'.format(line))
+        nodes.append(AbstractNode.node(*quads))
+
+    if len(nodes) == 1:
+        raise InvalidPattern('empty Macrocell dump')
+
+    universe = HashLifeUniverse(nodes[-1], rule = rule)
+    universe._generation, universe._origin = generation, origin
+    return universe
+
+def write_macrocell(universe, stream):
+    """Write the tree of `universe` to `stream` in the Macrocell format"""
+    root = universe.root
+    while root.level < 3:
+        root = root.extend()
+
+    stream.write('[M2] (hashlife.py)\n#R {}\n'.format(universe.rule))
+    if universe.generation:
+        stream.write('#G {}\n'.format(universe.generation))
+    if universe.origin != (0, 0):
+        stream.write('#O {} {}\n'.format(*universe.origin))
+
+    ids = {}
+
+    def write(node):
+        if node.population == 0:
+            return 0
+        if node in ids:
+            return ids[node]
+        if node.level == 3:
+            mask = level3_mask(node)
+            rows = [''.join('*' if (mask >> (63 - 8 * r - c)) & 1 else '.'
+                            for c in range(8)).rstrip('.')
+                    for r in range(8)]
+            while not rows[-1]:
+                rows.pop()
+            stream.write(''.join(row + '$' for row in rows) + '\n')
+        else:
+            quads = [write(q) for q in (node.nw, node.ne, node.sw, node.se)]
+            stream.write('{} {} {} {} {}\n'.format(node.level, *quads))
+        ids[node] = len(ids) + 1
+        return ids[node]
+
+    if write(root) == 0:
+        # Empty universe: the root still has to be the last node.
+        stream.write('$\n')
+
+# --------------------------------------------------------------------
+# Tutorial_8 boards
+#
+# The width and the height of the board on the first two lines, then
+# one live cell `x,y` per line.
+
+def read_lf(stream):
+    """(width, height, live cells) of the board read from `stream`"""
+    lines = [line.strip() for line in stream if line.strip()]
+    try:
+        width, height = int(lines[0]), int(lines[1])
+        cells = set()
+        for line in lines[2:]:
+            x, y = line.split(',')
+            cells.add((int(x), int(y)))
+    except (IndexError, ValueError):
+        raise InvalidPattern('invalid board file')
+    return width, height, cells
+
+# --------------------------------------------------------------------
+# Random soups
+
+def soup(size, density = 0.4, seed = 0):
+    """(size, size, live cells) of a random `size`x`size` soup"""
+    rng = random.Random(seed)
+    return size, size, {(x, y) for x in range(size) for y in range(size)
+                               if rng.random() < density}
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Title: On-disk store of HashLife nodes and results
+
+A store saves the canonical nodes of a memo of `forward` (see
+`hashlife.Memo`), together with the results it holds, so that another
+process can load them back and start with a warm memo:
+
+    write_store('nodes.hls', universe.memo, [universe])
+    ...
+    universe, = read_store('nodes.hls', memo)
+
+The file is a flat array of little-endian 64-bit words, so that it can
+be memory-mapped rather than parsed:
+
+ - the magic word `MAGIC`, then the numbers of nodes, results and
+   roots, and the rule of the results (see `_rule_word`);
+ - the nodes, children first, as 5 words each: the level, then the
+   numbers of the 4 quadrants (numbered from 1 in order, 0 for an
+   empty one) -- or for leaves, 3 then the 64-bit mask of their cells
+   (see `level3_mask`) and 3 zeros;
+ - the results, as 3 words each: the number of the node, the step l
+   and the number of the result of `forward(l)`;
+ - the roots, as 4 words each: their number, their level and the
+   coordinates x, y of their centre (see `HashLifeUniverse.origin`),
+   as signed words.
+"""
+
+import numpy as np
+
+from hashlife import MEMO, AbstractNode, HashLifeUniverse, level3_mask
+
+MAGIC = int.from_bytes(b'HLSTORE2', 'little')
+
+# --------------------------------------------------------------------
+class InvalidStore(Exception):
+    pass
+
+def _rule_word(rule):
+    """Bits 0 to 8 for the births of `rule`, 9 to 17 for survivals"""
+    return sum(1 << k for k in rule.birth) | sum(1 << (9 + k) for k in rule.survival)
+
+def write_store(path, memo = None, roots = ()):
+    """
+    Write the nodes and results of `memo` (by default, `MEMO`) and
+    the `roots` to the file `path`. A root is either a universe, whose
+    origin is kept, or a node, centred at (0, 0).
+    """
+    memo = MEMO if memo is None else memo
+    ids, nodes = {}, []
+
+    def number(node):
+        if node.population == 0:
+            return 0
+        if node in ids:
+            return ids[node]
+        if node.level == 3:
+            nodes.append((3, level3_mask(node), 0, 0, 0))
+        else:
+            quads = [number(q) for q in (node.nw, node.ne, node.sw, node.se)]
+            nodes.append((node.level, *quads))
+        ids[node] = len(nodes)
+        return ids[node]
+
+    edges = [(number(node), l, number(result))
+             for node, results in memo.items()
+             for l, result in enumerate(results) if result is not None]
+    records = []
+    for root in roots:
+        if isinstance(root, HashLifeUniverse):
+            root, (x, y) = root.root, root.origin
+        else:
+            x, y = 0, 0
+        while root.level < 3:
+            root = root.extend()
+        records.append((number(root), root.level, x, y))
+
+    header = np.array([MAGIC, len(nodes), len(edges), len(records), _rule_word(memo.rule)],
+                      dtype = '<u8')
+    with open(path, 'wb') as stream:
+        for words in (header, nodes, edges):
+            np.asarray(words, dtype = '<u8').tofile(stream)
+        np.asarray(records, dtype = '<i8').tofile(stream)
+
+def read_store(path, memo = None):
+    """
+    Load the store `path` into `memo` (by default, `MEMO`), which must
+    be for the same rule, and return the universes of its roots
+    """
+    memo  = MEMO if memo is None else memo
+    words = np.memmap(path, dtype = '<u8', mode = 'r')
+
+    if len(words) < 5 or int(words[0]) != MAGIC:
+        raise InvalidStore('not a HashLife store: {}'.format(path))
+    n, e, r, rule = (int(w) for w in words[1:5])
+    if len(words) != 5 + 5 * n + 3 * e + 4 * r:
+        raise InvalidStore('truncated HashLife store: {}'.format(path))
+    if rule != _rule_word(memo.rule):
+        raise InvalidStore('store for another rule than {}: {}'.format(memo.rule, path))
+
+    nodes = [None]
+    words = words[5:]
+    for level, a, b, c, d in words[:5 * n].reshape(n, 5).tolist():
+        if level == 3:
+            nodes.append(AbstractNode.leaf(a))
+            continue
+        zero = AbstractNode.zero(level - 1)
+        nodes.append(AbstractNode.node(*(nodes[q] if q else zero for q in (a, b, c, d))))
+
+    edges = words[5 * n:5 * n + 3 * e].reshape(e, 3).tolist()
+    for node, l, result in edges:
+        node = nodes[node]
+        memo.put(node, l, nodes[result] if result else AbstractNode.zero(node.level - 1))
+
+    universes = []
+    for root, level, x, y in words[5 * n + 3 * e:].view('<i8').reshape(r, 4).tolist():
+        universe = HashLifeUniverse(nodes[root] if root else AbstractNode.zero(level))
+        universe._memo, universe._origin = memo, (x, y)
+        universes.append(universe)
+    return universes
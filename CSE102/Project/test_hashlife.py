@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Regression tests of the Life engines against a brute-force stepper on
+sets of live cells.
+"""
+
+import io
+import json
+import random
+
+import numpy as np
+
+import hashlife
+import patterns
+import store
+from hashlife import (BitRowUniverse, HashLifeUniverse, Memo, NaiveUniverse,
+                      NumpyUniverse, Rule)
+
+RULES = ['B3/S23', 'B36/S23', 'B3/S012345678', 'B2/S']
+
+# --------------------------------------------------------------------
+def brute(cells, n, rule):
+    """Live cells after `n` rounds of the live cells `cells`"""
+    rule = Rule(rule)
+    for _ in range(n):
+        counts = {p: 0 for p in cells}
+        for (i, j) in cells:
+            for di in (-1, 0, 1):
+                for dj in (-1, 0, 1):
+                    if di or dj:
+                        counts[i+di, j+dj] = counts.get((i+di, j+dj), 0) + 1
+        cells = {p for p, c in counts.items() if rule.next_state(p in cells, c)}
+    return cells
+
+def live(universe):
+    """Live cells of the HashLife universe `universe`"""
+    bbox = universe.live_bbox()
+    if bbox is None:
+        return set()
+    imin, jmin, _, _ = bbox
+    return {(imin + int(i), jmin + int(j)) for i, j in zip(*np.nonzero(universe.to_array(bbox)))}
+
+def soup(seed, size = 12, density = 0.4):
+    rng = random.Random(seed)
+    return {(i, j) for i in range(size) for j in range(size) if rng.random() < density}
+
+# --------------------------------------------------------------------
+def check_rounds(rule, seeds = range(6), steps = (1, 2, 3, 8, 13, 64)):
+    for seed in seeds:
+        cells    = soup(seed)
+        universe = HashLifeUniverse.from_cells(cells, rule = rule)
+        for n in steps:
+            universe.rounds(n)
+            cells = brute(cells, n, rule)
+            assert live(universe) == cells, (rule, seed, universe.generation)
+
+def test_hashlife_rounds():
+    check_rounds('B3/S23')
+
+def test_hashlife_rules():
+    check_rounds('B36/S23')
+    # Isolated cells survive; patterns exploding in all directions
+    check_rounds('B3/S012345678', range(2), (1, 2, 3, 8, 13))
+    check_rounds('B2/S', range(2), (1, 2, 3, 8, 13))
+
+def test_rule():
+    for text in ('B3/S23', 'b3/s23', '23/3', 'S23/B3', ' B3 / S23 '):
+        assert Rule(text) == Rule('B3/S23') and str(Rule(text)) == 'B3/S23'
+    for text in ('B3', 'B3/S29', 'X3/S23', 'B03/S23'):
+        try:
+            Rule(text)
+            assert False, text
+        except ValueError:
+            pass
+
+    # `decide` on bitboards holding every (count, state) at once, bit
+    # 2 * count + state
+    for rule in map(Rule, RULES + ['B1357/S02468', 'B/S']):
+        bits = [sum(1 << (2 * n + x) for n in range(9) for x in (0, 1) if test(n, x))
+                for test in [lambda n, x, k = k: (n >> k) & 1 for k in range(4)] +
+                            [lambda n, x: x]]
+        result = rule.decide(*bits)
+        assert all(((result >> (2 * n + x)) & 1) == rule.next_state(x, n)
+                   for n in range(9) for x in (0, 1)), rule
+
+def test_hashlife_small_memo():
+    # A memo small enough to evict results during a single jump
+    cells    = soup(7, 16)
+    universe = HashLifeUniverse.from_cells(cells, budget = 8)
+    universe.rounds(100)
+    assert live(universe) == brute(cells, 100, 'B3/S23')
+    assert len(universe.memo) <= 8 and universe.memo.evictions > 0
+
+def test_hashlife_get():
+    cells    = soup(3)
+    universe = HashLifeUniverse.from_cells(cells)
+    universe.rounds(10)
+    cells = brute(cells, 10, 'B3/S23')
+    assert all(universe.get(i, j) == ((i, j) in cells)
+               for i in range(-20, 32) for j in range(-20, 32))
+
+def test_array():
+    rng   = np.random.RandomState(5)
+    cells = rng.rand(37, 20) < 0.4
+    universe = HashLifeUniverse.from_array(cells)
+    imin, jmin = -(37 // 2), -(20 // 2)
+    assert (universe.to_array((imin, jmin, imin + 37, jmin + 20)) == cells).all()
+    assert live(universe) == {(imin + int(i), jmin + int(j)) for i, j in zip(*np.nonzero(cells))}
+
+    # The root, from `to_array` of its own area and back
+    back = HashLifeUniverse.from_array(universe.to_array())
+    assert back.root is universe.root
+
+def grid(seed, n = 11, m = 13):
+    rng = random.Random(seed)
+    return [[rng.random() < 0.4 for _ in range(m)] for _ in range(n)]
+
+def test_numpy_universe():
+    for rule in RULES:
+        cells = grid(rule)
+        naive = NaiveUniverse(11, 13, [row[:] for row in cells], rule)
+        array = NumpyUniverse(11, 13, cells, rule)
+        for _ in range(8):
+            naive.round(); array.round()
+            assert array.cells.tolist() == [[bool(x) for x in row] for row in naive.cells]
+            assert all(array.get(i, j) == naive.get(i, j) for i in range(11) for j in range(13))
+
+def test_bitrow_universe():
+    for rule in RULES:
+        cells = grid(rule, 9, 70)       # rows wider than 64 bits
+        naive = NaiveUniverse(9, 70, [row[:] for row in cells], rule)
+        rows  = BitRowUniverse(9, 70, cells, rule)
+        for _ in range(8):
+            naive.round(); rows.round()
+            assert rows.cells == [[bool(x) for x in row] for row in naive.cells]
+
+        points = {(i, j) for i in range(9) for j in range(70) if rows.get(i, j)}
+        assert set(rows.points()) == points
+        assert BitRowUniverse.from_points(9, 70, points, rule).cells == rows.cells
+
+def test_macrocell_origin():
+    glider   = {(0, 1), (1, -1), (1, 1), (2, 0), (2, 1)}
+    universe = HashLifeUniverse.from_cells(glider)
+    universe.rounds(1000)
+    assert universe.origin != (0, 0)
+
+    stream = io.StringIO()
+    patterns.write_macrocell(universe, stream)
+    stream.seek(0)
+    back = patterns.read_macrocell(stream)
+
+    assert back.live_bbox() == universe.live_bbox()
+    assert live(back) == live(universe) == brute(glider, 1000, 'B3/S23')
+    assert back.generation == 1000
+
+def test_profiling():
+    universe = HashLifeUniverse.from_cells(soup(11, 16), budget = 1 << 16)
+    with hashlife.profiling() as profile:
+        universe.rounds(13)
+    assert hashlife.PROFILE is None
+
+    # One step per set bit of 13, from the generation it starts at
+    assert [(s['generation'], s['rounds']) for s in profile.steps] == [(0, 1), (1, 4), (5, 8)]
+    assert all(s['memo_size'] <= len(universe.memo) for s in profile.steps)
+    assert sum(s['new_nodes'] for s in profile.steps) <= sum(profile.nodes.values())
+
+    # The memo of the universe was only used within the profile
+    assert sum(profile.hits.values())   == universe.memo.hits
+    assert sum(profile.misses.values()) == universe.memo.misses > 0
+
+    levels = profile.as_dict()['levels']
+    for level, record in levels.items():
+        assert record['hits']      == profile.hits[level]
+        assert record['misses']    == profile.misses[level]
+        assert record['new_nodes'] == profile.nodes[level]
+    assert json.loads(profile.to_json())['steps'] == profile.steps
+
+    try:
+        with hashlife.profiling():
+            raise KeyError
+    except KeyError:
+        pass
+    assert hashlife.PROFILE is None
+
+def test_store(tmp_path):
+    glider = {(0, 1), (1, -1), (1, 1), (2, 0), (2, 1)}
+    small  = HashLifeUniverse(3, 3, [[0, 1, 0], [0, 0, 1], [1, 1, 1]])
+    moved  = HashLifeUniverse.from_cells(glider, budget = 1 << 12)
+    moved.rounds(1000)
+
+    path = str(tmp_path / 'nodes.hls')
+    store.write_store(path, moved.memo, [small, moved, small.root])
+    memo = Memo(rule = moved.rule)
+    back = store.read_store(path, memo)
+
+    assert [live(u) for u in back] == [live(small), live(moved), live(small)]
+    assert back[1].origin == moved.origin
+    assert len(memo.items()) > 0
+
+def test_pattern_rules():
+    assert str(patterns.read_rle(io.StringIO('x = 3, y = 1\n3o!\n'), 'B36/S23').rule) == 'B36/S23'
+    assert str(patterns.read_rle(io.StringIO('x = 3, y = 1, rule = B2/S\n3o!\n'), 'B36/S23').rule) == 'B2/S'
+    assert patterns.read_lf(io.StringIO('5\n5\n1,2\n2,2\n')) == (5, 5, {(1, 2), (2, 2)})
+    for text in ('', '5\n', '5\n5\n1;2\n'):
+        try:
+            patterns.read_lf(io.StringIO(text))
+            assert False, text
+        except patterns.InvalidPattern:
+            pass
+
+def test_frames():
+    glider = {(0, 1), (1, -1), (1, 1), (2, 0), (2, 1)}
+    block  = {(-6, -6), (-6, -5), (-5, -6), (-5, -5)}
+    bbox   = (-8, -8, 16, 16)
+    universe, check = (HashLifeUniverse.from_cells(glider | block) for _ in range(2))
+
+    frames = list(universe.frames(bbox, every = 3, count = 30))
+    assert len(frames) == 30 and universe.generation == 87
+    for frame in frames:
+        assert (frame == check.to_array(bbox)).all(), check.generation
+        check.rounds(3)
+
+    # The glider has left the viewport, the block stays
+    assert frames[0].sum() == 9 and frames[-1].sum() == 4
+
+def test_cycle():
+    glider = {(0, 1), (1, -1), (1, 1), (2, 0), (2, 1)}
+    assert HashLifeUniverse.from_cells(glider).cycle() == (0, 4, (1, 1))
+    assert HashLifeUniverse.from_cells({(0, 0), (0, 1), (0, 2)}).cycle() == (0, 2, (0, 0))
+    assert HashLifeUniverse.from_cells(soup(3)).cycle(size = 64) is not None
+    # A glider flying away from a blinker, given up after ~200 rounds
+    away = glider | {(i - 10, 0) for i in range(3)}
+    assert HashLifeUniverse.from_cells(away).cycle(size = 64) is None
@@ -1,4 +1,9 @@
 # --------------------------------------------------------------------
+import collections
+import concurrent.futures
+import io
+import os
+
 import huffman
 
 # To write the binary huffman implementation in a more modular way, we
@@ -155,41 +160,183 @@ def huffman_bdecode_tree(data):
     return _huffman_bdecode_tree(BitInBuffer(data))
 
 # --------------------------------------------------------------------
-def _huffman_bencode(tree, s, buf):
-    codes = huffman_bcodes(tree)
+def _huffman_bencode_codes(codes, s, buf):
     for x in s:
         buf.push_bits(*codes[x])
     return buf
 
+def _huffman_bencode(tree, s, buf):
+    return _huffman_bencode_codes(huffman_bcodes(tree), s, buf)
+
 def huffman_bencode(tree, s):
     return _huffman_bencode(tree, s, BitOutBuffer()).contents()
 
 # --------------------------------------------------------------------
+# Rather than walking down the tree one bit at a time, we decode with
+# lookup tables: the entry of a table for the next k bits of the input
+# is `(value, length, None)` if they start with the code (of `length`
+# bits) of `value`, or `(None, k, sub)` if they are the first k bits of
+# a longer code, which is then decoded by the table `sub` for the bits
+# that follow. The decoder keeps the bits read ahead in an integer
+# `acc`, which it refills 8 bytes at a time.
+
+TABLE_BITS = 10
+
+def _huffman_btable(codes):
+    # `codes` is a list of triples (value, length, code)
+    k = max(1, min(TABLE_BITS, max(length for _, length, _ in codes)))
+    table, longer = [None] * (1 << k), {}
+
+    for value, length, code in codes:
+        if length <= k:
+            shift = k - length
+            table[code << shift:(code + 1) << shift] = \
+                [(value, length, None)] * (1 << shift)
+        else:
+            longer.setdefault(code >> (length - k), []).append(
+                (value, length - k, code & ((1 << (length - k)) - 1)))
+
+    for prefix, sub in longer.items():
+        table[prefix] = (None, k, _huffman_btable(sub))
+    return (k, table)
+
+def huffman_btable(tree):
+    """Return (k, table), the decoding table of `tree` for k bits"""
+    codes = huffman_bcodes(tree)
+    return _huffman_btable([(x, n, c) for x, (n, c) in codes.items()])
+
+def _huffman_btable_decode(btable, buf, n):
+    data = buf._data
+    pos, bpos = buf._pos
+    acc, nbits = 0, 0
+    if bpos != 0:
+        acc, nbits, pos = data[pos] & (0xff >> bpos), 8 - bpos, pos + 1
+
+    aout = []
+    for _ in range(n):
+        k, table = btable
+        while True:
+            if nbits < k:
+                chunk = data[pos:pos+8]
+                acc   = (acc << (8 * len(chunk))) | int.from_bytes(chunk, 'big')
+                nbits, pos = nbits + 8 * len(chunk), pos + len(chunk)
+            if nbits >= k:
+                value, length, sub = table[(acc >> (nbits - k)) & ((1 << k) - 1)]
+            else:
+                # Fewer than k bits left: complete them with zeros
+                value, length, sub = table[(acc << (k - nbits)) & ((1 << k) - 1)]
+            if length > nbits:
+                raise EndOfBuffer
+            nbits -= length
+            acc &= (1 << nbits) - 1
+            if sub is None:
+                break
+            k, table = sub
+        aout.append(value)
+
+    buf._pos = divmod(8 * pos - nbits, 8)
+    return aout
+
 def _huffman_bdecode(tree, buf, n):
     if n == 0:
         return ''
     if tree.value is not None:
         return tree.value * n
-
-    aout = []
-    for _ in range(n):
-        current = tree
-        while current.value is None:
-            current = current.right if buf.pop_bit() else current.left
-        aout.append(current.value)
-    return ''.join(aout)
+    return ''.join(_huffman_btable_decode(huffman_btable(tree), buf, n))
 
 def huffman_bdecode(tree, data, n):
     return _huffman_bdecode(tree, BitInBuffer(data), n)
 
 # --------------------------------------------------------------------
-def huffman_bcompress(s):
+# Canonical Huffman codes
+#
+# Only the length of the code of each character matters for the size
+# of the output. Given the lengths, the canonical codes are assigned
+# in order of (length, character): each code is the previous one plus
+# one, shifted left by the difference of their lengths. The encoder
+# and the decoding tables can then be built from the lengths alone,
+# without any tree, and the decoding tables only depend on the lengths
+# so that we can cache them. The cache only keeps the last
+# `CANONICAL_BTABLES` tables used: a stream mostly gets one table per
+# block (of 30 KB or so), which would otherwise be kept forever.
+#
+# The lengths are written, in that same order, as the characters
+# preceded by as many `1`s as the length grows and a `0`. Since the
+# codes are complete, the list ends when they fill all the codes of
+# the current length: this takes 9 bits per character plus the largest
+# length, where the tree takes 10 bits per character minus one.
+
+def huffman_blengths(tree):
+    return { x: n for x, (n, _) in huffman_bcodes(tree).items() }
+
+def _canonical_order(lengths):
+    return sorted(lengths.items(), key = lambda xn: (xn[1], xn[0]))
+
+def canonical_bcodes(lengths):
+    codes, code, depth = {}, 0, 0
+    for x, n in _canonical_order(lengths):
+        code <<= n - depth
+        codes[x], code, depth = (n, code), code + 1, n
+    return codes
+
+CANONICAL_BTABLES  = 16
+_CANONICAL_BTABLES = collections.OrderedDict()
+
+def canonical_btable(lengths):
+    """Return (k, table), the decoding table of the canonical codes"""
+    key = tuple(_canonical_order(lengths))
+    if key in _CANONICAL_BTABLES:
+        _CANONICAL_BTABLES.move_to_end(key)
+        return _CANONICAL_BTABLES[key]
+    codes = canonical_bcodes(lengths)
+    btable = _CANONICAL_BTABLES[key] = \
+        _huffman_btable([(x, n, c) for x, (n, c) in codes.items()])
+    if len(_CANONICAL_BTABLES) > CANONICAL_BTABLES:
+        _CANONICAL_BTABLES.popitem(last = False)
+    return btable
+
+def _huffman_bencode_lengths(lengths, buf, code = ord):
+    depth = 0
+    for x, n in _canonical_order(lengths):
+        buf.push_bits(n - depth + 1, ((1 << (n - depth)) - 1) << 1)
+        buf.push_byte(code(x))
+        depth = n
+    return buf
+
+def _huffman_bdecode_lengths(buf, symbol = chr):
+    # `free` is the number of codes of length `depth` still unused
+    lengths, depth, free = {}, 0, 1
+    if buf.empty():
+        return lengths
+    while free > 0:
+        if buf.pop_bit():
+            depth, free = depth + 1, 2 * free
+            if depth > 255:
+                raise InvalidHuffmanStream
+        else:
+            lengths[symbol(buf.pop_byte())], free = depth, free - 1
+    return lengths
+
+def _canonical_bdecode(lengths, buf, n):
+    if n == 0:
+        return ''
+    if len(lengths) == 1:
+        return next(iter(lengths)) * n
+    return ''.join(_huffman_btable_decode(canonical_btable(lengths), buf, n))
+
+# --------------------------------------------------------------------
+def huffman_bcompress(s, canonical = False):
     tree = huffman.huffman_tree(huffman.huffman_stats(s))
     buf  = BitOutBuffer()
 
     buf.push_bytes(int.to_bytes(len(s), 4, 'little'))
-    _huffman_bencode_tree(tree, buf)
-    buf.pad(); _huffman_bencode(tree, s, buf)
+    if canonical:
+        lengths = huffman_blengths(tree)
+        _huffman_bencode_lengths(lengths, buf)
+        buf.pad(); _huffman_bencode_codes(canonical_bcodes(lengths), s, buf)
+    else:
+        _huffman_bencode_tree(tree, buf)
+        buf.pad(); _huffman_bencode(tree, s, buf)
 
     return buf.contents()
 
@@ -197,10 +344,13 @@ def huffman_bcompress(s):
 class InvalidHuffmanStream(Exception):
     pass
 
-def _huffman_buncompress(data):
+def _huffman_buncompress(data, canonical = False):
     try:
         buf  = BitInBuffer(data)
         ln   = int.from_bytes(buf.pop_bytes(4), 'little')
+        if canonical:
+            lengths = _huffman_bdecode_lengths(buf)
+            buf.sync(); return (ln, lengths, _canonical_bdecode(lengths, buf, ln))
         tree = _huffman_bdecode_tree(buf)
 
         buf.sync(); return (ln, tree, _huffman_bdecode(tree, buf, ln))
@@ -208,8 +358,8 @@ def _huffman_buncompress(data):
     except EndOfBuffer:
         raise InvalidHuffmanStream
 
-def huffman_buncompress(data):
-    return _huffman_buncompress(data)[-1]
+def huffman_buncompress(data, canonical = False):
+    return _huffman_buncompress(data, canonical)[-1]
 
 # Now binary huffman compression is an actual text compression
 # algorithm (as opposed to the non-binary version which is an
@@ -235,3 +385,254 @@ def huffman_buncompress(data):
 # >>> c = bhuffman.huffman_bcompress(s)
 # >>> len(s)/len(c)
 # 3.3090668431502315
+
+# --------------------------------------------------------------------
+# Bytes
+#
+# The same canonical format works directly on binary data: `bytes`,
+# `bytearray`, `memoryview` or `mmap`, seen through a `memoryview` of
+# unsigned bytes so that the symbols are the integers 0 to 255. The
+# frequencies are counted with a `Counter`, and the encoder gathers the
+# codes in an integer that it writes out 8 bytes at a time, so that no
+# `str` is ever created for the characters.
+
+def huffman_bstats_bytes(data):
+    return collections.Counter(memoryview(data).cast('B'))
+
+def _huffman_bencode_bytes(codes, data, buf):
+    # `buf` must be aligned
+    acc, nbits, out = 0, 0, bytearray()
+    for x in memoryview(data).cast('B'):
+        n, code = codes[x]
+        acc, nbits = (acc << n) | code, nbits + n
+        if nbits >= 64:
+            nbits -= 64
+            out.extend(int.to_bytes(acc >> nbits, 8, 'big'))
+            acc &= (1 << nbits) - 1
+    buf.push_bytes(out)
+    buf.push_bits(nbits, acc)
+    return buf
+
+def huffman_bcompress_bytes(data):
+    stats   = huffman_bstats_bytes(data)
+    lengths = huffman_blengths(huffman.huffman_tree(stats))
+    codes   = [None] * 256
+    for x, code in canonical_bcodes(lengths).items():
+        codes[x] = code
+
+    buf = BitOutBuffer()
+    buf.push_bytes(int.to_bytes(sum(stats.values()), 4, 'little'))
+    _huffman_bencode_lengths(lengths, buf, int)
+    buf.pad(); _huffman_bencode_bytes(codes, data, buf)
+
+    return buf.contents()
+
+def huffman_buncompress_bytes(data):
+    try:
+        buf     = BitInBuffer(memoryview(data).cast('B'))
+        ln      = int.from_bytes(buf.pop_bytes(4), 'little')
+        lengths = _huffman_bdecode_lengths(buf, int)
+        buf.sync()
+
+        if ln == 0:
+            return b''
+        if len(lengths) == 1:
+            return bytes(lengths) * ln
+        return bytes(_huffman_btable_decode(canonical_btable(lengths), buf, ln))
+
+    except EndOfBuffer:
+        raise InvalidHuffmanStream
+
+# >>> c = bhuffman.huffman_bcompress_bytes('Ünïcödé'.encode('utf-8'))
+# >>> bhuffman.huffman_buncompress_bytes(c).decode('utf-8')
+# 'Ünïcödé'
+
+# --------------------------------------------------------------------
+# Streaming compression
+#
+# To compress inputs that do not fit in memory, we cut them into blocks
+# of `block_size` characters and compress each block on its own, with
+# its own canonical code table (see above). The output is the magic
+# bytes `STREAM_MAGIC` followed by one frame per block: the size of the
+# compressed block in bytes (4 bytes, little-endian), then the block
+# encoded in UTF-8 as written by `huffman_bcompress_bytes`, since the
+# codes of `huffman_bcompress` only hold characters up to 255. Only one
+# block is ever held in memory, and the output is written block by
+# block. Binary files are cut into blocks of `block_size` bytes, which
+# are written as they are, after the magic bytes `BYTES_MAGIC` instead.
+#
+# A frame of size 0 ends the blocks. It is followed by the index of the
+# blocks, so that they can be found without reading the whole stream:
+# their number (4 bytes), then for each block its offset in the stream
+# (8 bytes), its compressed size and its number of characters (4 bytes
+# each), and finally the offset of the index (8 bytes) and the magic
+# bytes `INDEX_MAGIC`.
+
+STREAM_MAGIC = b'BHUF'
+BYTES_MAGIC  = b'BHUB'
+INDEX_MAGIC  = b'BIDX'
+BLOCK_SIZE   = 1 << 16
+
+def _huffman_bframe(block):
+    if isinstance(block, str):
+        # Lone surrogates (e.g. from `surrogateescape`) go through too
+        block = block.encode('utf-8', 'surrogatepass')
+    data = huffman_bcompress_bytes(block)
+    return int.to_bytes(len(data), 4, 'little') + data
+
+def _huffman_bunframe(data, binary = False):
+    data = huffman_buncompress_bytes(data)
+    if binary:
+        return data
+    try:
+        return data.decode('utf-8', 'surrogatepass')
+    except UnicodeDecodeError:
+        raise InvalidHuffmanStream
+
+def _huffman_bblocks(fin, block_size):
+    while True:
+        block = fin.read(block_size)
+        if not block:
+            return
+        yield block
+
+def _huffman_bmagic(fin):
+    # Return True for a stream of bytes, False for a stream of text
+    magic = fin.read(len(STREAM_MAGIC))
+    if magic not in (STREAM_MAGIC, BYTES_MAGIC):
+        raise InvalidHuffmanStream
+    return magic == BYTES_MAGIC
+
+def _huffman_bframes(fin):
+    while True:
+        size = fin.read(4)
+        if not size:
+            return
+        if len(size) < 4:
+            raise InvalidHuffmanStream
+        size = int.from_bytes(size, 'little')
+        if size == 0:
+            return
+        data = fin.read(size)
+        if len(data) < size:
+            raise InvalidHuffmanStream
+        yield data
+
+class _BIndexWriter:
+    def __init__(self, fout, binary):
+        self.fout   = fout
+        self.offset = len(STREAM_MAGIC)
+        self.blocks = []
+        fout.write(BYTES_MAGIC if binary else STREAM_MAGIC)
+
+    def write(self, frame, length):
+        self.fout.write(frame)
+        self.blocks.append((self.offset, len(frame) - 4, length))
+        self.offset += len(frame)
+
+    def close(self):
+        index = bytearray(int.to_bytes(0, 4, 'little'))
+        index.extend(int.to_bytes(len(self.blocks), 4, 'little'))
+        for offset, size, length in self.blocks:
+            index.extend(int.to_bytes(offset, 8, 'little'))
+            index.extend(int.to_bytes(size  , 4, 'little'))
+            index.extend(int.to_bytes(length, 4, 'little'))
+        index.extend(int.to_bytes(self.offset + 4, 8, 'little'))
+        index.extend(INDEX_MAGIC)
+        self.fout.write(bytes(index))
+
+def huffman_bstream_index(fin):
+    """
+    Return the list of the blocks (offset, size, length) of the
+    seekable stream `fin`, or None if it has no index
+    """
+    try:
+        fin.seek(-12, 2)
+    except (OSError, ValueError):
+        return None
+    footer = fin.read(12)
+    if len(footer) < 12 or footer[8:] != INDEX_MAGIC:
+        return None
+    fin.seek(int.from_bytes(footer[:8], 'little'))
+    n    = int.from_bytes(fin.read(4), 'little')
+    data = fin.read(16 * n)
+    if len(data) < 16 * n:
+        raise InvalidHuffmanStream
+    return [(int.from_bytes(data[i:i+8], 'little'),
+             int.from_bytes(data[i+8:i+12], 'little'),
+             int.from_bytes(data[i+12:i+16], 'little')) for i in range(0, 16 * n, 16)]
+
+def huffman_bcompress_stream(fin, fout, block_size = BLOCK_SIZE):
+    index = _BIndexWriter(fout, not isinstance(fin, io.TextIOBase))
+    for block in _huffman_bblocks(fin, block_size):
+        index.write(_huffman_bframe(block), len(block))
+    index.close()
+
+def huffman_buncompress_stream(fin, fout):
+    binary = _huffman_bmagic(fin)
+    for data in _huffman_bframes(fin):
+        fout.write(_huffman_bunframe(data, binary))
+
+# >>> with open('log.txt') as fin, open('log.bhuf', 'wb') as fout:
+# ...     bhuffman.huffman_bcompress_stream(fin, fout)
+# >>> with open('log.bhuf', 'rb') as fin, open('log2.txt', 'w') as fout:
+# ...     bhuffman.huffman_buncompress_stream(fin, fout)
+
+# --------------------------------------------------------------------
+# Parallel compression
+#
+# The blocks being independent, they can be compressed and
+# decompressed by a pool of processes. We keep at most `2 * workers`
+# blocks in flight, and write the results in order as they come. When
+# decompressing a file with an index, the workers read their blocks
+# from the file themselves.
+
+def _huffman_bunframe_at(path, offset, size, binary):
+    with open(path, 'rb') as fin:
+        fin.seek(offset + 4)
+        data = fin.read(size)
+    if len(data) < size:
+        raise InvalidHuffmanStream
+    return _huffman_bunframe(data, binary)
+
+def _ordered_map(executor, fn, args, window):
+    pending = collections.deque()
+    for arg in args:
+        pending.append(executor.submit(fn, *arg))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def huffman_bcompress_parallel(fin, fout, block_size = BLOCK_SIZE, workers = None):
+    workers = workers or os.cpu_count() or 1
+    index   = _BIndexWriter(fout, not isinstance(fin, io.TextIOBase))
+    lengths = collections.deque()
+
+    def blocks():
+        for block in _huffman_bblocks(fin, block_size):
+            lengths.append(len(block))
+            yield (block,)
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        for frame in _ordered_map(executor, _huffman_bframe, blocks(), 2 * workers):
+            index.write(frame, lengths.popleft())
+    index.close()
+
+def huffman_buncompress_parallel(fin, fout, workers = None):
+    workers = workers or os.cpu_count() or 1
+    path, blocks = getattr(fin, 'name', None), None
+    if isinstance(path, str) and fin.seekable():
+        blocks = huffman_bstream_index(fin)
+        fin.seek(0)
+    binary = _huffman_bmagic(fin)
+
+    if blocks is None:
+        fn, args = _huffman_bunframe, ((data, binary) for data in _huffman_bframes(fin))
+    else:
+        fn, args = _huffman_bunframe_at, ((path, offset, size, binary)
+                                          for offset, size, _ in blocks)
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        for block in _ordered_map(executor, fn, args, 2 * workers):
+            fout.write(block)
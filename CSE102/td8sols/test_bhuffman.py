@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Round-trip tests of the binary Huffman codecs.
+"""
+
+import io
+import random
+
+import pytest
+
+# huffman.py builds its trees with the `heap` module of the course,
+# which is not in this repository: without it, nothing here can run.
+pytest.importorskip('heap', reason = 'huffman.py needs the heap module of the course')
+
+import bhuffman
+
+def texts():
+    rng = random.Random(0)
+    yield from ['a', 'aaaa', 'ab', 'Hello world! How are you doing these days?', 'Lorem' * 1000]
+    # Skewed frequencies give codes longer than the decoding tables
+    yield ''.join(chr(65 + i) * int(1.7 ** i) for i in range(18))
+    for _ in range(10):
+        alphabet = [chr(c) for c in rng.sample(range(256), rng.randint(1, 60))]
+        weights  = [rng.random() ** 4 for _ in alphabet]
+        yield ''.join(rng.choices(alphabet, weights, k = rng.randint(1, 3000)))
+
+# --------------------------------------------------------------------
+def test_tree():
+    for s in texts():
+        assert bhuffman.huffman_buncompress(bhuffman.huffman_bcompress(s)) == s
+
+def test_canonical():
+    for s in [''] + list(texts()):
+        data = bhuffman.huffman_bcompress(s, canonical = True)
+        assert bhuffman.huffman_buncompress(data, canonical = True) == s
+        assert len(data) <= len(bhuffman.huffman_bcompress(s)) + 1
+
+def test_canonical_invalid():
+    # A header whose lengths keep growing, past any valid code
+    with pytest.raises(bhuffman.InvalidHuffmanStream):
+        bhuffman.huffman_buncompress(b'\x05\x00\x00\x00' + b'\xff' * 40, canonical = True)
+
+def test_bytes():
+    for s in [b'', bytes(range(256)) * 3, 'Ünïcödé ✓'.encode('utf-8')] + \
+             [s.encode('latin-1') for s in texts()]:
+        for data in (s, bytearray(s), memoryview(s)):
+            assert bhuffman.huffman_buncompress_bytes(bhuffman.huffman_bcompress_bytes(data)) == s
+
+def test_stream():
+    s = ''.join(texts())
+    for block_size in (97, 4096, bhuffman.BLOCK_SIZE):
+        fout = io.BytesIO()
+        bhuffman.huffman_bcompress_stream(io.StringIO(s), fout, block_size)
+        back = io.StringIO()
+        bhuffman.huffman_buncompress_stream(io.BytesIO(fout.getvalue()), back)
+        assert back.getvalue() == s
+
+        blocks = bhuffman.huffman_bstream_index(io.BytesIO(fout.getvalue()))
+        assert sum(length for _, _, length in blocks) == len(s)
+    assert len(bhuffman._CANONICAL_BTABLES) <= bhuffman.CANONICAL_BTABLES
+
+    # Characters beyond 255, over several UTF-8 bytes, and lone surrogates
+    for u in ('Ünïcödé ✓ 日本語 😀' * 50, 'a' * 96 + '✓' + 'b' * 200, '\udc80ab'):
+        fout, back = io.BytesIO(), io.StringIO()
+        bhuffman.huffman_bcompress_stream(io.StringIO(u), fout, 97)
+        bhuffman.huffman_buncompress_stream(io.BytesIO(fout.getvalue()), back)
+        assert back.getvalue() == u
+
+def test_bytes_stream(tmp_path):
+    b = ''.join(texts()).encode('latin-1') + bytes(range(256))
+    fout, back = io.BytesIO(), io.BytesIO()
+    bhuffman.huffman_bcompress_stream(io.BytesIO(b), fout, 1000)
+    bhuffman.huffman_buncompress_stream(io.BytesIO(fout.getvalue()), back)
+    assert back.getvalue() == b
+
+    path = tmp_path / 'bytes.bhuf'
+    with open(str(path), 'wb') as f:
+        bhuffman.huffman_bcompress_parallel(io.BytesIO(b), f, 1000, workers = 2)
+    assert path.read_bytes() == fout.getvalue()
+    with open(str(path), 'rb') as fin:
+        back = io.BytesIO()
+        bhuffman.huffman_buncompress_parallel(fin, back, workers = 2)
+        assert back.getvalue() == b
+
+def test_stream_invalid():
+    with pytest.raises(bhuffman.InvalidHuffmanStream):
+        bhuffman.huffman_buncompress_stream(io.BytesIO(b'XXXX'), io.StringIO())
+    with pytest.raises(bhuffman.InvalidHuffmanStream):
+        bhuffman.huffman_buncompress_stream(io.BytesIO(b'BHUF\x10\x00\x00\x00ab'), io.StringIO())
+
+def test_parallel(tmp_path):
+    s = ''.join(texts())
+    stream = io.BytesIO()
+    bhuffman.huffman_bcompress_stream(io.StringIO(s), stream, 4096)
+
+    fout = io.BytesIO()
+    bhuffman.huffman_bcompress_parallel(io.StringIO(s), fout, 4096, workers = 2)
+    assert fout.getvalue() == stream.getvalue()
+
+    # From a file, the workers read their blocks by the index
+    path = tmp_path / 'text.bhuf'
+    path.write_bytes(fout.getvalue())
+    with open(str(path), 'rb') as fin:
+        assert len(bhuffman.huffman_bstream_index(fin)) == len(s) // 4096 + 1
+    with open(str(path), 'rb') as fin:
+        back = io.StringIO()
+        bhuffman.huffman_buncompress_parallel(fin, back, workers = 2)
+        assert back.getvalue() == s
+
+    # Without a path, the frames are read in sequence and sent to them
+    back = io.StringIO()
+    bhuffman.huffman_buncompress_parallel(io.BytesIO(fout.getvalue()), back, workers = 2)
+    assert back.getvalue() == s